@@ -1,9 +1,12 @@
+import time
+import pandas as pd
 import streamlit as st
-import cv2
-import numpy as np
-from src.feature_extraction import FeatureExtractor
-from src.classifier import WasteClassifier
+from src.batch_classify import classify_uploads
 from src.feedback_collector import FeedbackCollector
+from src.feedback_writer import FeedbackWriter
+from src.image_upload import decode_upload, make_preview
+from src.model_registry import ModelRegistry
+from src.result_cache import ResultCache, image_key, text_key
 
 st.set_page_config(
     page_title="GreenTrash - Classificação Inteligente",
@@ -70,19 +73,36 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_model_registry():
+    # Um registro por processo: modelo e extrator são compartilhados por
+    # todas as sessões; o session_state guarda só dados do usuário. Novas
+    # versões publicadas em models/ são trocadas sem reiniciar o app.
+    return ModelRegistry().start()
+
+
+@st.cache_resource
+def get_result_cache():
+    # Resultados repetidos (mesma foto, mesmo texto) não passam de novo pela
+    # extração e pelo modelo; uma troca de modelo invalida as entradas.
+    return ResultCache()
+
+
+@st.cache_resource
+def get_feedback_writer():
+    # Os botões de feedback só enfileiram; uma thread grava em lotes.
+    return FeedbackWriter(FeedbackCollector()).start()
+
+
 def initialize_session_state():
-    if 'extractor' not in st.session_state:
-        st.session_state.extractor = FeatureExtractor()
-    if 'classifier' not in st.session_state:
-        st.session_state.classifier = WasteClassifier()
     if 'last_result' not in st.session_state:
         st.session_state.last_result = None
     if 'last_features' not in st.session_state:
         st.session_state.last_features = None
     if 'last_text' not in st.session_state:
         st.session_state.last_text = ""
-    if 'feedback_collector' not in st.session_state:
-        st.session_state.feedback_collector = FeedbackCollector()
+    if 'bulk_results' not in st.session_state:
+        st.session_state.bulk_results = None
 
 
 def render_introduction():
@@ -232,11 +252,12 @@ def render_classifier():
     st.markdown('<div class="main-header">🔍 Classificar Resíduo</div>', unsafe_allow_html=True)
     st.markdown("---")
     
-    if st.session_state.classifier.model is None:
+    if not get_model_registry().has_model:
         st.markdown("""
         <div class="warning-box">
-        <p>⚠️ <strong>Modelo não treinado!</strong></p>
-        <p>Execute o script de treinamento com imagens reais:</p>
+        <p>⚠️ <strong>Modelo não treinado ou desatualizado!</strong></p>
+        <p>Modelos treinados antes da versão atual das features não são carregados.
+        Execute o script de treinamento com imagens reais:</p>
         <code>python train_model_real.py</code>
         <p><em>O sistema funcionará em modo fallback (apenas texto).</em></p>
         </div>
@@ -246,11 +267,16 @@ def render_classifier():
     
     input_method = st.radio(
         "Escolha como deseja fornecer informações sobre o resíduo:",
-        ["📸 Imagem", "✍️ Somente Texto"],
+        ["📸 Imagem", "✍️ Somente Texto", "🗂️ Várias Imagens"],
         horizontal=True
     )
     
+    if input_method == "🗂️ Várias Imagens":
+        render_bulk_classifier()
+        return
+    
     image = None
+    image_bytes = None
     text = ""
     
     if input_method == "📸 Imagem":
@@ -265,16 +291,16 @@ def render_classifier():
             
             if uploaded_file is not None:
                 try:
-                    file_bytes = np.asarray(bytearray(uploaded_file.read()), dtype=np.uint8)
-                    image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-                    
-                    if image is not None and image.size > 0:
-                        st.image(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), 
-                                caption="Imagem carregada", 
-                                use_container_width=True)
-                    else:
-                        st.error("Erro ao carregar imagem. Tente outro formato.")
-                        image = None
+                    # Decodificada já reduzida ao necessário para o extrator;
+                    # a tela mostra só uma miniatura.
+                    image_bytes = uploaded_file.getvalue()
+                    image = decode_upload(image_bytes, get_model_registry().extractor.plan.image_size)
+                    st.image(make_preview(image), 
+                            caption="Imagem carregada", 
+                            use_container_width=True)
+                except ValueError as e:
+                    st.error(str(e))
+                    image = None
                 except Exception as e:
                     st.error(f"Erro ao processar imagem: {str(e)}")
                     image = None
@@ -307,16 +333,22 @@ def render_classifier():
         
         with st.spinner("🔄 Analisando resíduo..."):
             try:
-                if image is not None:
-                    visual_features = st.session_state.extractor.extract_visual_features(image)
-                    text_features = st.session_state.extractor.extract_text_features(text)
-                    features = np.concatenate([visual_features, text_features])
-                else:
-                    visual_features = np.zeros(118)
-                    text_features = st.session_state.extractor.extract_text_features(text)
-                    features = np.concatenate([visual_features, text_features])
-                
-                result = st.session_state.classifier.predict(features, text=text)
+                registry = get_model_registry()
+                cache = get_result_cache()
+                text_features = registry.extractor.extract_text_features(text)
+                with registry.classifier() as classifier:
+                    tie_hint = classifier.tie_hint(text)
+                    if image is not None:
+                        key = image_key(image_bytes, text_features, tie_hint)
+                    else:
+                        key = text_key(text_features, tie_hint)
+                    cached = cache.get(key, classifier.version)
+                    if cached is not None:
+                        features, result = cached
+                    else:
+                        features = registry.extractor.extract_combined_features(image, text)
+                        result = classifier.predict(features, text=text)
+                        cache.put(key, classifier.version, (features, result))
                 st.session_state.last_result = result
                 st.session_state.last_features = features
                 st.session_state.last_text = text
@@ -375,6 +407,10 @@ def render_classifier():
         
         with st.expander("ℹ️ Informações Técnicas"):
             st.json(result)
+            cache_stats = get_result_cache().stats()
+            st.caption(f"Cache de resultados: {cache_stats['entries']} entradas | "
+                       f"acertos {cache_stats['hits']} | faltas {cache_stats['misses']} | "
+                       f"descartes {cache_stats['evictions']}")
         
         if result.get('needs_feedback', False):
             st.markdown("---")
@@ -393,48 +429,101 @@ def render_classifier():
                     st.rerun()
             with feedback_col[1]:
                 if st.button("🌱 Orgânico", key="feedback_organic", use_container_width=True):
-                    st.session_state.feedback_collector.save_feedback(
-                        st.session_state.last_features,
-                        result['classe'],
-                        'Orgânico',
-                        st.session_state.last_text
-                    )
-                    st.success("Feedback registrado!")
-                    st.session_state.last_result = None
-                    st.rerun()
+                    submit_feedback(result, 'Orgânico')
             with feedback_col[2]:
                 if st.button("♻️ Reciclável", key="feedback_recyclable", use_container_width=True):
-                    st.session_state.feedback_collector.save_feedback(
-                        st.session_state.last_features,
-                        result['classe'],
-                        'Reciclável',
-                        st.session_state.last_text
-                    )
-                    st.success("Feedback registrado!")
-                    st.session_state.last_result = None
-                    st.rerun()
+                    submit_feedback(result, 'Reciclável')
             with feedback_col[3]:
                 if st.button("🗑️ Rejeito", key="feedback_reject", use_container_width=True):
-                    st.session_state.feedback_collector.save_feedback(
-                        st.session_state.last_features,
-                        result['classe'],
-                        'Rejeito',
-                        st.session_state.last_text
-                    )
-                    st.success("Feedback registrado!")
-                    st.session_state.last_result = None
-                    st.rerun()
+                    submit_feedback(result, 'Rejeito')
             with feedback_col[4]:
                 if st.button("⚠️ Perigoso", key="feedback_dangerous", use_container_width=True):
-                    st.session_state.feedback_collector.save_feedback(
-                        st.session_state.last_features,
-                        result['classe'],
-                        'Perigoso',
-                        st.session_state.last_text
-                    )
-                    st.success("Feedback registrado!")
-                    st.session_state.last_result = None
-                    st.rerun()
+                    submit_feedback(result, 'Perigoso')
+
+
+def submit_feedback(result, correction):
+    # submit() devolve False quando a fila está cheia e o registro é descartado;
+    # nesse caso o resultado continua na tela para o usuário tentar de novo.
+    accepted = get_feedback_writer().submit(
+        st.session_state.last_features,
+        result['classe'],
+        correction,
+        st.session_state.last_text
+    )
+    if not accepted:
+        st.warning("⚠️ Feedback não registrado: a fila de gravação está cheia. Tente novamente em instantes.")
+        return
+    st.success("Feedback registrado!")
+    st.session_state.last_result = None
+    st.rerun()
+
+
+def render_bulk_classifier():
+    uploaded_files = st.file_uploader(
+        "Carregue as imagens dos resíduos",
+        type=['jpg', 'jpeg', 'png', 'bmp', 'webp'],
+        accept_multiple_files=True,
+        help="Várias imagens de uma vez; todas são classificadas num único lote."
+    )
+    text = st.text_input(
+        "Descrição comum a todas as imagens (opcional)",
+        placeholder="Ex: material da esteira 2, embalagens..."
+    )
+    
+    if st.button("🔍 Classificar Lote", use_container_width=True):
+        if not uploaded_files:
+            st.error("❌ Por favor, carregue ao menos uma imagem")
+            return
+        
+        progress_bar = st.progress(0.0, text="🔄 Analisando resíduos...")
+        
+        def report_progress(done, total):
+            progress_bar.progress(done / total, text=f"🔄 {done} de {total} imagens analisadas")
+        
+        start = time.perf_counter()
+        try:
+            rows = classify_uploads(get_model_registry(),
+                                    [(file.name, file.getvalue()) for file in uploaded_files],
+                                    text, cache=get_result_cache(), progress=report_progress)
+        except Exception as e:
+            st.error(f"❌ Erro ao classificar: {str(e)}")
+            return
+        progress_bar.empty()
+        st.session_state.bulk_results = rows
+        st.session_state.bulk_time = time.perf_counter() - start
+    
+    rows = st.session_state.bulk_results
+    if not rows:
+        return
+    
+    st.markdown('<div class="sub-header">📊 Resultados do Lote</div>', unsafe_allow_html=True)
+    results = pd.DataFrame(rows)
+    classified = results[results['Erro'] == ""]
+    st.caption(f"{len(rows)} imagens em {st.session_state.bulk_time:.1f}s | "
+               f"{len(rows) - len(classified)} com erro | "
+               f"{int(classified['Revisar'].sum())} para revisar")
+    
+    counts = st.columns(4)
+    for column, class_name in zip(counts, ['Orgânico', 'Reciclável', 'Rejeito', 'Perigoso']):
+        column.metric(class_name, int((classified['Classe'] == class_name).sum()))
+    
+    # Clicar no cabeçalho de uma coluna ordena a tabela.
+    st.dataframe(
+        results,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Confiança': st.column_config.ProgressColumn('Confiança', format="%.2f", min_value=0, max_value=1),
+            'Revisar': st.column_config.CheckboxColumn('Revisar')
+        }
+    )
+    st.download_button(
+        "⬇️ Exportar CSV",
+        results.to_csv(index=False).encode('utf-8-sig'),
+        file_name="greentrash_lote.csv",
+        mime="text/csv",
+        use_container_width=True
+    )
 
 
 def main():
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import time
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+from src.feature_extraction import FeatureExtractor
+from src.classifier import WasteClassifier
+from src.feature_cache import FeatureCache
+from src.calibration import expected_calibration_error
+from src.dataset_manifest import DatasetManifest, deduplicate_entries, filter_entries_by_quality
+from src.pipeline import stream_training_features, collect_features
+
+
+CONFIGURATIONS = [
+    ('cv', 'isotonic'),
+    ('oob', 'isotonic'),
+    ('oob', 'sigmoid'),
+    ('oob', 'temperature'),
+    ('holdout', 'isotonic'),
+    ('holdout', 'sigmoid'),
+    ('holdout', 'temperature'),
+]
+
+
+def load_dataset():
+    class_mapping = {
+        'organic': 'Orgânico',
+        'recyclable': 'Reciclável',
+        'reject': 'Rejeito',
+        'dangerous': 'Perigoso'
+    }
+    manifest = DatasetManifest()
+    entries, _ = deduplicate_entries(manifest.scan('assets/images', class_mapping))
+    entries, _ = filter_entries_by_quality(entries)
+
+    extractor = FeatureExtractor()
+    cache = FeatureCache(extractor)
+    visual_features, y = collect_features(stream_training_features(entries, extractor, cache, seed=42))
+    text_features = np.tile(extractor.extract_text_features(""), (len(visual_features), 1))
+    return np.hstack([visual_features, text_features]), y
+
+
+def measure(mode, method, X_train, y_train, X_test, y_test, model_dir):
+    classifier = WasteClassifier(model_root=os.path.join(model_dir, f'{mode}_{method}'))
+
+    start = time.perf_counter()
+    classifier.train(X_train, y_train, calibrate=True, calibration_mode=mode, calibration_method=method)
+    train_time = time.perf_counter() - start
+    classifier.save_model()
+    pickle_mb = os.path.getsize(classifier.model_path) / 1e6
+    artifact_mb = sum(entry.stat().st_size for entry in os.scandir(classifier.artifact_path)) / 1e6
+
+    # Carga como na aplicação (ModelRegistry): classificador novo, artefato
+    # compilado mapeado em memória e uma predição de teste.
+    start = time.perf_counter()
+    classifier = WasteClassifier(model_root=classifier.store.root)
+    classifier.predict_batch(X_test[:1])
+    load_ms = (time.perf_counter() - start) * 1000
+
+    batch = classifier.predict_batch(X_test)
+    proba = batch.probabilities
+    true_columns = np.array([classifier.CLASSES.index(label) for label in y_test])
+    true_proba = proba[np.arange(len(y_test)), true_columns]
+
+    samples = X_test[:min(len(X_test), 100)]
+    start = time.perf_counter()
+    for features in samples:
+        classifier.predict(features)
+    latency_ms = (time.perf_counter() - start) / max(len(samples), 1) * 1000
+
+    return {
+        'modo': f'{mode}/{method}',
+        'ece': expected_calibration_error(proba, y_test, classifier.CLASSES),
+        'log_loss': float(-np.mean(np.log(np.clip(true_proba, 1e-12, 1)))),
+        'acuracia': accuracy_score(y_test, batch.labels),
+        'artefato_mb': artifact_mb,
+        'pkl_mb': pickle_mb,
+        'treino_s': train_time,
+        'carga_ms': load_ms,
+        'latencia_ms': latency_ms
+    }
+
+
+def compare_calibration():
+    print("="*60)
+    print("COMPARAÇÃO DE MODOS DE CALIBRAÇÃO - GreenTrash")
+    print("="*60)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+
+    print("\n1. Carregando features...")
+    X, y = load_dataset()
+    if len(X) < 20:
+        print("\n❌ Poucas imagens para comparar. Verifique a pasta assets/images/")
+        return
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    print(f"  - Treino: {len(X_train)} | Teste: {len(X_test)}")
+
+    print("\n2. Treinando e medindo cada configuração...")
+    results = []
+    with tempfile.TemporaryDirectory() as model_dir:
+        for mode, method in CONFIGURATIONS:
+            print(f"\n  → {mode}/{method}")
+            results.append(measure(mode, method, X_train, y_train, X_test, y_test, model_dir))
+
+    print("\n" + "="*60)
+    print("RELATÓRIO")
+    print("="*60)
+    print(f"{'Modo':<22} {'ECE':>6} {'LogLoss':>8} {'Acur.':>6} {'Art. MB':>8} {'pkl MB':>7} "
+          f"{'Treino':>7} {'Carga ms':>9} {'ms/amostra':>10}")
+    print("-" * 90)
+    for r in results:
+        print(f"{r['modo']:<22} {r['ece']:>6.3f} {r['log_loss']:>8.3f} {r['acuracia']:>6.3f} "
+              f"{r['artefato_mb']:>8.2f} {r['pkl_mb']:>7.2f} {r['treino_s']:>6.1f}s  {r['carga_ms']:>8.1f} "
+              f"{r['latencia_ms']:>10.2f}")
+    print("\nArt. MB: artefato compilado (.npy), o que a aplicação carrega; pkl MB: modelo sklearn.")
+    print("Carga: artefato mapeado em memória mais uma predição de teste, como no ModelRegistry.")
+
+
+if __name__ == "__main__":
+    compare_calibration()
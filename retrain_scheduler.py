@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from src.feedback_collector import FeedbackCollector
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Agendador de re-treino sem intervenção: a cada poll_interval confere o
+# total de feedbacks (pelo índice do log, sem relê-lo) e dispara
+# `retrain_with_feedback.py --incremental` quando chegaram min_feedback
+# registros desde a última execução ou quando max_interval passou. O job roda
+# num subprocesso de prioridade mínima, preso a poucos núcleos e com limite
+# de memória, para não disputar CPU com a inferência na mesma máquina. O
+# próprio job compara o candidato com a versão atual num holdout antes de
+# ativá-lo. Cada execução vira uma linha em models/retrain_jobs.jsonl com
+# duração, pico de memória e tempo por etapa. Só um job que termina normalmente
+# (publicado, rejeitado ou sem nada novo) avança o estado; uma falha ou estouro
+# de tempo é repetida após uma espera que dobra a cada falha seguida.
+
+COMPLETED_STATUSES = ('publicado', 'rejeitado', 'nao_verificado', 'nada_novo', 'sem_modelo')
+
+RETRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'retrain_with_feedback.py')
+
+
+class RetrainScheduler:
+    def __init__(self, min_feedback=50, max_interval=6 * 3600, poll_interval=60, cpus=1, memory_mb=2048,
+                 timeout=3600, retry_delay=300, model_root='models', job_args=()):
+        self.min_feedback = min_feedback
+        self.max_interval = max_interval
+        self.poll_interval = poll_interval
+        self.memory_mb = memory_mb
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.job_args = list(job_args)
+        self.collector = FeedbackCollector(os.path.join(model_root, 'feedback_data.jsonl'),
+                                           os.path.join(model_root, 'feedback_data.json'))
+        self.state_file = os.path.join(model_root, 'scheduler_state.json')
+        self.jobs_log = os.path.join(model_root, 'retrain_jobs.jsonl')
+        self.logs_dir = os.path.join(model_root, 'retrain_logs')
+        # Os últimos núcleos disponíveis ficam com o re-treino.
+        if hasattr(os, 'sched_getaffinity'):
+            self.cores = sorted(os.sched_getaffinity(0))[-cpus:]
+        else:
+            self.cores = None
+        self.cpus = cpus
+        self._stop = threading.Event()
+
+    def read_state(self):
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'last_run': 0.0, 'feedback_count': 0}
+
+    def _write_state(self, state):
+        temp_path = self.state_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_file)
+
+    def due(self, state, feedback_count, now):
+        # Motivo para rodar agora, ou None.
+        if now < state.get('retry_at', 0.0):
+            return None
+        if feedback_count < state['feedback_count']:
+            return 'log_recriado'
+        if feedback_count - state['feedback_count'] >= self.min_feedback:
+            return 'feedback'
+        if now - state['last_run'] >= self.max_interval:
+            return 'intervalo'
+        return None
+
+    def stop(self, *args):
+        self._stop.set()
+
+    def run_forever(self):
+        print(f"Agendador de re-treino: a cada {self.min_feedback} feedbacks ou {self.max_interval}s "
+              f"({self.cpus} núcleo(s), {self.memory_mb} MB)")
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.poll_interval)
+
+    def check(self):
+        state = self.read_state()
+        feedback_count = self.collector.get_feedback_count()
+        reason = self.due(state, feedback_count, time.time())
+        if reason is None:
+            return None
+        record = self.run_job(reason, feedback_count)
+        if record['exit_code'] == 0 and not record['timed_out'] and record['status'] in COMPLETED_STATUSES:
+            # Conta o feedback como processado mesmo com o candidato rejeitado,
+            # para não repetir o mesmo job a cada verificação.
+            self._write_state({'last_run': time.time(), 'feedback_count': feedback_count})
+        else:
+            failures = state.get('failures', 0) + 1
+            delay = min(self.retry_delay * 2 ** (failures - 1), self.max_interval)
+            self._write_state(dict(state, failures=failures, retry_at=time.time() + delay))
+            print(f"Re-treino falhou ({failures}x seguida(s)); nova tentativa em {delay:.0f}s")
+        return record
+
+    def _limit_child(self):
+        # Executado no filho, antes do exec (só POSIX).
+        os.nice(19)
+        if self.cores and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, self.cores)
+        if resource is not None and self.memory_mb:
+            # RLIMIT_DATA não conta arquivos mapeados (cache de features,
+            # artefato compilado), só heap e mapeamentos anônimos.
+            limit_kind = getattr(resource, 'RLIMIT_DATA', resource.RLIMIT_AS)
+            limit = self.memory_mb << 20
+            resource.setrlimit(limit_kind, (limit, limit))
+
+    def _child_env(self):
+        env = dict(os.environ, GREENTRASH_WORKERS=str(self.cpus), PYTHONIOENCODING='utf-8')
+        for name in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'LOKY_MAX_CPU_COUNT'):
+            env[name] = str(self.cpus)
+        return env
+
+    def run_job(self, reason, feedback_count):
+        os.makedirs(self.logs_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        log_path = os.path.join(self.logs_dir, f'{stamp}.log')
+        report_path = os.path.join(self.logs_dir, f'{stamp}.json')
+        command = [sys.executable, RETRAIN_SCRIPT, '--incremental', '--report', os.path.abspath(report_path)]
+        command += self.job_args
+        print(f"[{stamp}] Re-treino iniciado ({reason}, {feedback_count} feedbacks)")
+
+        started = time.perf_counter()
+        with open(log_path, 'wb') as log:
+            if os.name == 'posix':
+                process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT,
+                                           env=self._child_env(), preexec_fn=self._limit_child)
+            else:
+                # No Windows só a prioridade é limitada.
+                process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=self._child_env(),
+                                           creationflags=subprocess.IDLE_PRIORITY_CLASS)
+            exit_code, peak_rss, timed_out = self._wait(process)
+        duration = time.perf_counter() - started
+
+        try:
+            with open(report_path, encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            report = {'status': 'erro'}
+        record = {
+            'started_at': stamp,
+            'reason': reason,
+            'feedback_count': feedback_count,
+            'exit_code': exit_code,
+            'timed_out': timed_out,
+            'duration': round(duration, 3),
+            'peak_rss_mb': round(peak_rss / (1 << 20), 1) if peak_rss is not None else None,
+            'log': log_path,
+            **report
+        }
+        with open(self.jobs_log, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"[{stamp}] Re-treino terminado: {record['status']} em {duration:.1f}s "
+              f"(pico {record['peak_rss_mb']} MB, versão {record.get('version')})")
+        return record
+
+    def _wait(self, process):
+        # Devolve (código de saída, pico de RSS em bytes, estourou o tempo).
+        deadline = time.monotonic() + self.timeout
+        timed_out = False
+        if not hasattr(os, 'wait4'):
+            try:
+                process.wait(self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                timed_out = True
+            return process.returncode, None, timed_out
+
+        # wait4 devolve o uso de recursos só deste filho.
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if not timed_out and time.monotonic() > deadline:
+                process.kill()
+                timed_out = True
+            time.sleep(0.2)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss vem em KB no Linux e em bytes no macOS.
+        peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        return process.returncode, peak_rss, timed_out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-treina o modelo automaticamente em segundo plano.")
+    parser.add_argument('--min-feedback', type=int, default=50, help="feedbacks novos que disparam o re-treino")
+    parser.add_argument('--max-interval', type=float, default=6 * 3600,
+                        help="segundos máximos entre re-treinos, mesmo sem feedback suficiente")
+    parser.add_argument('--poll', type=float, default=60, help="intervalo entre verificações (s)")
+    parser.add_argument('--cpus', type=int, default=1, help="núcleos reservados ao re-treino")
+    parser.add_argument('--memory-mb', type=int, default=2048, help="limite de memória do re-treino")
+    parser.add_argument('--timeout', type=float, default=3600, help="tempo máximo de um re-treino (s)")
+    parser.add_argument('--retry-delay', type=float, default=300,
+                        help="espera após um re-treino que falhou (s); dobra a cada falha seguida")
+    parser.add_argument('--once', action='store_true', help="verifica uma vez e sai (para cron/Agendador)")
+    args, job_args = parser.parse_known_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    scheduler = RetrainScheduler(min_feedback=args.min_feedback, max_interval=args.max_interval,
+                                 poll_interval=args.poll, cpus=args.cpus, memory_mb=args.memory_mb,
+                                 timeout=args.timeout, retry_delay=args.retry_delay, job_args=job_args)
+    if args.once:
+        scheduler.check()
+    else:
+        signal.signal(signal.SIGINT, scheduler.stop)
+        signal.signal(signal.SIGTERM, scheduler.stop)
+        scheduler.run_forever()
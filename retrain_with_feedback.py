@@ -1,28 +1,42 @@
+import argparse
 import os
+import time
 import cv2
 import numpy as np
 import json
+from contextlib import contextmanager
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, precision_score, recall_score, f1_score
 from src.feature_extraction import FeatureExtractor
 from src.classifier import WasteClassifier
-from src.feedback_collector import FeedbackCollector
-from src.data_utils import load_images_from_folder, balance_classes_with_augmentation, detect_duplicates, filter_low_quality
+from src.feedback_store import FeedbackStore
+from src.feature_cache import FeatureCache
+from src.dataset_manifest import DatasetManifest, deduplicate_entries, filter_entries_by_quality
+from src.pipeline import stream_training_features, collect_features
+from src.incremental import HOLDOUT_EVERY, feedback_holdout, in_holdout, replay_indices
+
+CLASS_MAPPING = {
+    'organic': 'Orgânico',
+    'recyclable': 'Reciclável',
+    'reject': 'Rejeito',
+    'dangerous': 'Perigoso'
+}
 
 def retrain_with_feedback():
     print("="*60)
     print("RE-TREINAMENTO COM FEEDBACK - GreenTrash")
     print("="*60)
     
-    collector = FeedbackCollector()
-    feedbacks = collector.load_feedback()
+    store = FeedbackStore()
+    store.compact()
+    feedback = store.load()
     
-    if len(feedbacks) == 0:
+    if len(feedback) == 0:
         print("\n⚠️ Nenhum feedback coletado ainda.")
         print("Execute a aplicação e forneça feedback quando solicitado.")
         return
     
-    print(f"\n📊 Feedbacks coletados: {len(feedbacks)}")
+    print(f"\n📊 Feedbacks coletados: {len(feedback)}")
     
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
@@ -30,52 +44,31 @@ def retrain_with_feedback():
     print("\n1. Carregando dados originais...")
     base_path = 'assets/images'
     
-    class_mapping = {
-        'organic': 'Orgânico',
-        'recyclable': 'Reciclável',
-        'reject': 'Rejeito',
-        'dangerous': 'Perigoso'
-    }
-    
-    all_images = []
-    for folder_name, class_name in class_mapping.items():
-        folder_path = os.path.join(base_path, folder_name)
-        images = load_images_from_folder(folder_path, class_name)
-        all_images.extend(images)
+    manifest = DatasetManifest()
+    all_entries = manifest.scan(base_path, CLASS_MAPPING)
+    print(f"  - Imagens: {len(all_entries)} (novas ou alteradas: {manifest.stats['new'] + manifest.stats['changed']})")
     
     print("\n2. Processando imagens...")
-    unique_images, _ = detect_duplicates(all_images)
-    filtered_images, _ = filter_low_quality(unique_images)
-    balanced_images = balance_classes_with_augmentation(filtered_images)
+    unique_entries, _ = deduplicate_entries(all_entries)
+    filtered_entries, _ = filter_entries_by_quality(unique_entries)
+    training_entries = [entry for entry in filtered_entries if not in_holdout(entry['sha256'])]
+    print(f"  - Reservadas para o holdout: {len(filtered_entries) - len(training_entries)}")
     
     extractor = FeatureExtractor()
-    X_original = []
-    y_original = []
-    
-    for img, class_name in balanced_images:
-        visual_features = extractor.extract_visual_features(img)
-        text_features = extractor.extract_text_features("")
-        combined_features = np.concatenate([visual_features, text_features])
-        X_original.append(combined_features)
-        y_original.append(class_name)
-    
-    X_original = np.array(X_original)
-    y_original = np.array(y_original)
+    cache = FeatureCache(extractor)
+    visual_features, y_original = collect_features(
+        stream_training_features(training_entries, extractor, cache, seed=42))
+    print(f"  - Features em cache: {cache.hits} | extraídas: {len(visual_features) - cache.hits}")
+    text_features = np.tile(extractor.extract_text_features(""), (len(visual_features), 1))
+    X_original = np.hstack([visual_features, text_features])
     
     print("\n3. Adicionando dados de feedback ao conjunto de treino...")
-    X_feedback = []
-    y_feedback = []
+    # O feedback do holdout fica fora, como as imagens (ver src/incremental.py).
+    training_feedback = np.flatnonzero(~feedback_holdout(len(feedback)))
+    X_feedback = np.asarray(feedback.features[training_feedback])
+    y_feedback = feedback.correct[training_feedback]
     
-    for fb in feedbacks:
-        features = np.array(fb['features'])
-        correct_label = fb['correct']
-        X_feedback.append(features)
-        y_feedback.append(correct_label)
-    
-    X_feedback = np.array(X_feedback)
-    y_feedback = np.array(y_feedback)
-    
-    print(f"  - Amostras de feedback: {len(X_feedback)}")
+    print(f"  - Amostras de feedback: {len(X_feedback)} ({len(feedback) - len(X_feedback)} no holdout)")
     
     X_combined = np.vstack([X_original, X_feedback])
     y_combined = np.concatenate([y_original, y_feedback])
@@ -93,10 +86,7 @@ def retrain_with_feedback():
     classifier.train(X_train, y_train, calibrate=True)
     
     print("\n5. Avaliando modelo re-treinado...")
-    predictions = []
-    for features in X_test:
-        result = classifier.predict(features, text="")
-        predictions.append(result['classe'])
+    predictions = list(classifier.predict_batch(X_test, texts="").labels)
     
     print("\n" + "="*60)
     print("RELATÓRIO DE CLASSIFICAÇÃO (APÓS RE-TREINO)")
@@ -116,12 +106,205 @@ def retrain_with_feedback():
         print(f"{class_name:<15} {precision[i]:<12.3f} {recall[i]:<12.3f} {f1[i]:<12.3f}")
     
     print("\n6. Salvando modelo re-treinado...")
-    classifier.save_model()
+    classifier.save_model(info={'feedback_count': len(feedback)})
     
     print("\n" + "="*60)
     print("✓ Re-treino concluído com sucesso!")
     print("="*60)
 
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 3)
+
+def holdout_score(classifier, X, y):
+    predictions = classifier.predict_batch(X, texts="").labels
+    return float(f1_score(y, predictions, labels=classifier.CLASSES, average='macro', zero_division=0))
+
+def retrain_incremental(n_trees=50, max_trees=600, replay_ratio=2.0, min_replay=20,
+                        holdout_every=HOLDOUT_EVERY, min_holdout=20, max_holdout=5000, max_drop=0.01):
+    # Usa só o que chegou depois da versão atual (feedback novo e imagens
+    # ainda fora do cache de features) mais uma amostra de reposição por
+    # classe, tirada do cache e do feedback antigo; nada do corpus é
+    # decodificado ou extraído de novo. Uma fração fixa das imagens e do
+    # feedback (1 em holdout_every) nunca entra na janela nem no treino
+    # completo (ver src/incremental.py): o candidato só é ativado se o F1
+    # macro nela não cair mais que max_drop em relação à versão atual.
+    # Devolve um relatório com o resultado e o tempo por etapa.
+    print("="*60)
+    print("RE-TREINO INCREMENTAL - GreenTrash")
+    print("="*60)
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+    
+    timings = {}
+    report = {'status': 'sem_modelo', 'timings': timings}
+    classifier = WasteClassifier()
+    if not classifier.has_model or classifier.version is None:
+        print("\n⚠️ Nenhuma versão de modelo publicada; execute o treino completo.")
+        return report
+    info = classifier.store.read_info(classifier.version) or {}
+    report['base_version'] = classifier.version
+    
+    print(f"\n1. Versão atual: {classifier.version}")
+    with timed(timings, 'feedback'):
+        store = FeedbackStore()
+        store.compact()
+        feedback = store.load()
+    seen = info.get('feedback_count', 0)
+    if seen > len(feedback):
+        # O log de feedback foi recriado depois dessa versão.
+        seen = 0
+    held_feedback = feedback_holdout(len(feedback), holdout_every)
+    print(f"  - Feedbacks novos: {len(feedback) - seen} (de {len(feedback)})")
+    
+    print("\n2. Procurando imagens novas...")
+    with timed(timings, 'manifesto'):
+        manifest = DatasetManifest()
+        all_entries = manifest.scan('assets/images', CLASS_MAPPING)
+        unique_entries, _ = deduplicate_entries(all_entries)
+        filtered_entries, _ = filter_entries_by_quality(unique_entries)
+    
+    extractor = FeatureExtractor()
+    cache = FeatureCache(extractor)
+    new_entries = [entry for entry in filtered_entries if entry['sha256'] not in cache]
+    known_entries = [entry for entry in filtered_entries if entry['sha256'] in cache]
+    print(f"  - Imagens novas: {len(new_entries)} | já em cache: {len(known_entries)}")
+    
+    blank_text = extractor.extract_text_features("")
+    X_parts, y_parts = [], []
+    X_holdout, y_holdout = [], []
+    new_feedback = np.arange(seen, len(feedback))
+    new_feedback = new_feedback[~held_feedback[new_feedback]]
+    if len(new_feedback):
+        X_parts.append(np.asarray(feedback.features[new_feedback]))
+        y_parts.append(feedback.correct[new_feedback])
+    with timed(timings, 'extracao'):
+        if new_entries:
+            visual_features, labels = collect_features(
+                stream_training_features(new_entries, extractor, cache, seed=42, augment=False))
+            X_new = np.hstack([visual_features, np.tile(blank_text, (len(visual_features), 1))])
+            held = np.array([in_holdout(entry['sha256'], holdout_every) for entry in new_entries], dtype=bool)
+            X_parts.append(X_new[~held])
+            y_parts.append(labels[~held])
+            X_holdout.append(X_new[held])
+            y_holdout.append(labels[held])
+    n_new = sum(len(part) for part in y_parts)
+    report['new_samples'] = n_new
+    if n_new == 0:
+        print("\n✓ Nada novo desde a última versão.")
+        report['status'] = 'nada_novo'
+        return report
+    
+    print("\n3. Sorteando amostras de reposição e holdout...")
+    with timed(timings, 'reposicao'):
+        known_held = np.array([in_holdout(entry['sha256'], holdout_every) for entry in known_entries], dtype=bool)
+        pool_labels = np.concatenate([np.array([entry['class'] for entry in known_entries], dtype=str),
+                                      feedback.correct[:seen]])
+        pool_held = np.concatenate([known_held, held_feedback[:seen]])
+        per_class = max(min_replay, int(np.ceil(replay_ratio * n_new / len(classifier.CLASSES))))
+        # Semente fixa por estado dos dados: os mesmos dados dão o mesmo modelo.
+        rng = np.random.default_rng([42, len(feedback), len(known_entries)])
+        chosen = np.flatnonzero(~pool_held)[replay_indices(pool_labels[~pool_held], per_class, rng)]
+        held = np.flatnonzero(pool_held)
+        if len(held) > max_holdout:
+            held = np.sort(np.random.default_rng(0).choice(held, size=max_holdout, replace=False))
+        
+        for indices, X_target, y_target in ((chosen, X_parts, y_parts), (held, X_holdout, y_holdout)):
+            from_cache = indices[indices < len(known_entries)]
+            from_feedback = indices[indices >= len(known_entries)] - len(known_entries)
+            if len(from_cache):
+                cached, _ = cache.lookup(known_entries[i]['sha256'] for i in from_cache)
+                X_target.append(np.hstack([cached, np.tile(blank_text, (len(cached), 1))]))
+                y_target.append(pool_labels[from_cache])
+            if len(from_feedback):
+                X_target.append(np.asarray(feedback.features[from_feedback]))
+                y_target.append(feedback.correct[from_feedback])
+        new_held = np.flatnonzero(held_feedback[seen:]) + seen
+        if len(new_held):
+            X_holdout.append(np.asarray(feedback.features[new_held]))
+            y_holdout.append(feedback.correct[new_held])
+    
+    X_window = np.vstack(X_parts).astype(np.float32)
+    y_window = np.concatenate(y_parts)
+    X_holdout = np.vstack(X_holdout).astype(np.float32) if X_holdout else np.zeros((0, X_window.shape[1]), np.float32)
+    y_holdout = np.concatenate(y_holdout) if y_holdout else np.array([], dtype=str)
+    report['window'] = len(X_window)
+    report['holdout'] = len(X_holdout)
+    print(f"  - Reposição: {len(chosen)} amostras (até {per_class} por classe)")
+    print(f"  - Janela de treino: {len(X_window)} amostras | holdout: {len(X_holdout)}")
+    
+    use_holdout = len(X_holdout) >= min_holdout
+    if use_holdout:
+        with timed(timings, 'avaliacao_atual'):
+            report['score_current'] = holdout_score(classifier, X_holdout, y_holdout)
+    
+    print(f"\n4. Acrescentando {n_trees} árvores e recalibrando...")
+    try:
+        with timed(timings, 'treino'):
+            classifier.update(X_window, y_window, n_trees=n_trees, max_trees=max_trees)
+    except ValueError as e:
+        print(f"\n❌ Re-treino incremental impossível: {e}")
+        print("Execute o re-treino completo.")
+        report['status'] = 'erro'
+        report['error'] = str(e)
+        return report
+    
+    print("\n5. Comparando com a versão atual no holdout...")
+    approved = False
+    if use_holdout:
+        with timed(timings, 'avaliacao_candidato'):
+            report['score_candidate'] = holdout_score(classifier, X_holdout, y_holdout)
+        approved = report['score_candidate'] >= report['score_current'] - max_drop
+        print(f"  - F1 macro: atual {report['score_current']:.3f} | candidato {report['score_candidate']:.3f}")
+    else:
+        # Sem comparação possível o candidato é publicado, mas não ativado.
+        print(f"  - Holdout pequeno demais ({len(X_holdout)} < {min_holdout}); "
+              f"candidato publicado sem ativar.")
+    
+    print("\n6. Salvando modelo atualizado...")
+    with timed(timings, 'publicacao'):
+        version = classifier.save_model(activate=approved, info={
+            'feedback_count': len(feedback),
+            'incremental_from': info.get('version'),
+            'holdout': {key: report[key] for key in ('holdout', 'score_current', 'score_candidate') if key in report},
+            'approved': approved
+        })
+    report['version'] = version
+    if approved:
+        report['status'] = 'publicado'
+    else:
+        report['status'] = 'rejeitado' if use_holdout else 'nao_verificado'
+    
+    print("\n" + "="*60)
+    if approved:
+        print("✓ Re-treino incremental concluído!")
+    elif use_holdout:
+        print(f"❌ Candidato {version} rejeitado: pior que a versão atual no holdout.")
+    else:
+        print(f"⚠️ Candidato {version} não verificado (holdout pequeno); ative-o manualmente se desejar.")
+    print("="*60)
+    return report
+
 if __name__ == "__main__":
-    retrain_with_feedback()
+    parser = argparse.ArgumentParser(description="Re-treina o modelo com o feedback coletado.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="acrescenta árvores treinadas só nos dados novos em vez de treinar do zero")
+    parser.add_argument('--trees', type=int, default=50, help="árvores novas por re-treino incremental")
+    parser.add_argument('--max-trees', type=int, default=600, help="limite de árvores; as mais antigas saem")
+    parser.add_argument('--report', help="grava o relatório do re-treino incremental (JSON) neste arquivo")
+    args = parser.parse_args()
+    if args.incremental:
+        # O re-treino muda o diretório de trabalho para o do script.
+        report_path = os.path.abspath(args.report) if args.report else None
+        report = retrain_incremental(n_trees=args.trees, max_trees=args.max_trees)
+        if report_path:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+    else:
+        retrain_with_feedback()
 
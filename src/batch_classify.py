@@ -0,0 +1,91 @@
+from functools import partial
+import numpy as np
+from src.image_upload import decode_upload
+from src.parallel import chunked, default_workers, imap_chunks
+from src.result_cache import image_key
+
+
+# Classificação de vários arquivos de uma vez: decodificação e extração
+# rodam em blocos num pool de threads limitado (OpenCV e NumPy liberam o GIL)
+# e o modelo é chamado uma única vez para o lote inteiro.
+
+
+def decode_and_extract(extractor, blobs, max_bytes=None, max_pixels=None):
+    # Features visuais (N x visual_size) e a mensagem de erro de cada item
+    # (None quando deu certo; a linha correspondente fica zerada).
+    images = []
+    errors = []
+    for data in blobs:
+        try:
+            images.append(decode_upload(data, extractor.plan.image_size, max_bytes, max_pixels))
+            errors.append(None)
+        except ValueError as e:
+            errors.append(str(e))
+    features = np.zeros((len(errors), extractor.visual_size))
+    decoded = [i for i, error in enumerate(errors) if error is None]
+    if decoded:
+        features[decoded] = extractor.extract_visual_features_batch(images)
+    return features, errors
+
+
+def _extract_chunk(extractor, uploads, indices):
+    return decode_and_extract(extractor, [uploads[i][1] for i in indices])
+
+
+def classify_uploads(registry, uploads, text="", cache=None, workers=None, chunk_size=4, progress=None):
+    # uploads: lista de (nome, bytes). Devolve, na ordem recebida, uma linha
+    # por arquivo com o resultado e o erro (se houver). progress(feitos, total)
+    # é chamado na thread de quem chamou a cada bloco concluído.
+    extractor = registry.extractor
+    text_features = extractor.extract_text_features(text)
+    total = len(uploads)
+    features = np.zeros((total, extractor.feature_size))
+    features[:, extractor.visual_size:] = text_features
+    results = [None] * total
+    errors = [None] * total
+
+    with registry.classifier() as classifier:
+        tie_hint = classifier.tie_hint(text)
+        keys = [image_key(data, text_features, tie_hint) for _, data in uploads]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = cache.get(key, classifier.version) if cache is not None else None
+            if cached is not None:
+                features[i], results[i] = cached
+            else:
+                pending.append(i)
+        done = total - len(pending)
+        if progress is not None:
+            progress(done, total)
+
+        chunks = chunked(pending, chunk_size)
+        workers = min(workers or default_workers(), max(1, len(chunks)))
+        for indices, (visual, chunk_errors) in zip(chunks, imap_chunks(
+                partial(_extract_chunk, extractor, uploads), chunks, workers=workers, processes=False)):
+            features[indices, :extractor.visual_size] = visual
+            for i, error in zip(indices, chunk_errors):
+                errors[i] = error
+            done += len(indices)
+            if progress is not None:
+                progress(done, total)
+
+        to_predict = [i for i in pending if errors[i] is None]
+        if to_predict:
+            batch = classifier.predict_batch(features[to_predict], [text] * len(to_predict))
+            for position, i in enumerate(to_predict):
+                results[i] = batch[position]
+                if cache is not None:
+                    cache.put(keys[i], classifier.version, (features[i].copy(), results[i]))
+        class_names = classifier.CLASSES
+
+    rows = []
+    for (name, _), result, error in zip(uploads, results, errors):
+        row = {'Arquivo': name, 'Classe': None, 'Confiança': None}
+        row.update({class_name: None for class_name in class_names})
+        row.update({'Revisar': None, 'Erro': error or ""})
+        if result is not None:
+            row.update({'Classe': result['classe'], 'Confiança': result['confianca'],
+                        'Revisar': result['needs_feedback']})
+            row.update(result['probabilidades'])
+        rows.append(row)
+    return rows
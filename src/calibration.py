@@ -0,0 +1,131 @@
+import numpy as np
+from scipy.optimize import minimize_scalar
+from scipy.special import expit
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+
+
+# Calibração de uma única floresta. Em vez de CalibratedClassifierCV(cv=3),
+# que treina e mantém três florestas, a floresta é treinada uma vez e os
+# calibradores são ajustados nas probabilidades out-of-bag (mode='oob') ou
+# num conjunto separado (mode='holdout').
+
+CALIBRATION_MODES = ('cv', 'oob', 'holdout')
+CALIBRATION_METHODS = ('isotonic', 'sigmoid', 'temperature')
+
+
+def apply_calibration(proba, method, isotonic_tables=None, sigmoid_a=None, sigmoid_b=None, temperature=1.0):
+    # proba: (N, C) probabilidades da floresta, colunas na ordem de classes_.
+    n_classes = proba.shape[1]
+    if method == 'temperature':
+        scaled = proba ** (1.0 / temperature)
+        return scaled / scaled.sum(axis=1, keepdims=True)
+
+    calibrated = np.empty_like(proba)
+    for k in range(n_classes):
+        if method == 'isotonic':
+            x, y = isotonic_tables[k]
+            calibrated[:, k] = np.interp(proba[:, k], x, y)
+        else:
+            calibrated[:, k] = expit(-(sigmoid_a[k] * proba[:, k] + sigmoid_b[k]))
+
+    # Um contra todos normalizado, como em CalibratedClassifierCV.
+    denominator = calibrated.sum(axis=1, keepdims=True)
+    calibrated = np.divide(calibrated, denominator, out=np.full_like(calibrated, 1 / n_classes),
+                           where=denominator != 0)
+    calibrated[(1.0 < calibrated) & (calibrated <= 1.0 + 1e-5)] = 1.0
+    return calibrated
+
+
+class CalibratedForest:
+    def __init__(self, forest, method, isotonic_tables=None, sigmoid_a=None, sigmoid_b=None, temperature=1.0):
+        if method not in CALIBRATION_METHODS:
+            raise ValueError(f"Método de calibração desconhecido: {method}")
+        self.forest = forest
+        self.method = method
+        self.isotonic_tables = isotonic_tables
+        self.sigmoid_a = sigmoid_a
+        self.sigmoid_b = sigmoid_b
+        self.temperature = temperature
+        self.classes_ = forest.classes_
+
+    def predict_proba(self, X):
+        return apply_calibration(self.forest.predict_proba(X), self.method, self.isotonic_tables,
+                                 self.sigmoid_a, self.sigmoid_b, self.temperature)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def fit_calibrators(proba, y, classes, method):
+    # Ajusta os parâmetros de calibração em (proba, y) e devolve os kwargs de
+    # CalibratedForest.
+    targets = (np.asarray(y)[:, None] == np.asarray(classes)[None, :]).astype(np.float64)
+
+    if method == 'isotonic':
+        tables = []
+        for k in range(len(classes)):
+            isotonic = IsotonicRegression(y_min=0, y_max=1, out_of_bounds='clip').fit(proba[:, k], targets[:, k])
+            tables.append((isotonic.X_thresholds_.astype(np.float64), isotonic.y_thresholds_.astype(np.float64)))
+        return {'isotonic_tables': tables}
+
+    if method == 'sigmoid':
+        sigmoid_a = np.zeros(len(classes))
+        sigmoid_b = np.zeros(len(classes))
+        for k in range(len(classes)):
+            if targets[:, k].min() == targets[:, k].max():
+                # Classe ausente (ou única) no conjunto de calibração.
+                sigmoid_b[k] = -20.0 if targets[0, k] else 20.0
+                continue
+            platt = LogisticRegression(C=1e6).fit(proba[:, [k]], targets[:, k])
+            sigmoid_a[k] = -platt.coef_[0, 0]
+            sigmoid_b[k] = -platt.intercept_[0]
+        return {'sigmoid_a': sigmoid_a, 'sigmoid_b': sigmoid_b}
+
+    if method == 'temperature':
+        true_class = np.argmax(targets, axis=1)
+
+        def negative_log_likelihood(log_temperature):
+            calibrated = apply_calibration(proba, 'temperature', temperature=np.exp(log_temperature))
+            return -np.mean(np.log(np.clip(calibrated[np.arange(len(proba)), true_class], 1e-12, None)))
+
+        result = minimize_scalar(negative_log_likelihood, bounds=(-3.0, 3.0), method='bounded')
+        return {'temperature': float(np.exp(result.x))}
+
+    raise ValueError(f"Método de calibração desconhecido: {method}")
+
+
+def fit_calibrated_forest(forest, X, y, mode='oob', method='isotonic', holdout_size=0.2, random_state=42):
+    # Treina `forest` (não ajustada) e calibra suas probabilidades.
+    if mode == 'oob':
+        forest.set_params(oob_score=True, bootstrap=True)
+        forest.fit(X, y)
+        proba = forest.oob_decision_function_
+        # Amostras que nunca ficaram fora do bootstrap saem com linha zerada.
+        valid = np.isfinite(proba).all(axis=1) & (proba.sum(axis=1) > 0)
+        calibration_proba, calibration_y = proba[valid], np.asarray(y)[valid]
+    elif mode == 'holdout':
+        X_fit, X_calibration, y_fit, calibration_y = train_test_split(
+            X, y, test_size=holdout_size, random_state=random_state, stratify=y
+        )
+        forest.fit(X_fit, y_fit)
+        calibration_proba = forest.predict_proba(X_calibration)
+    else:
+        raise ValueError(f"Modo de calibração de floresta única desconhecido: {mode}")
+
+    params = fit_calibrators(calibration_proba, calibration_y, forest.classes_, method)
+    return CalibratedForest(forest, method, **params)
+
+
+def expected_calibration_error(proba, y, classes, n_bins=10):
+    # ECE da classe prevista (confiança x acerto) em n_bins faixas iguais.
+    confidence = proba.max(axis=1)
+    correct = np.asarray(classes)[np.argmax(proba, axis=1)] == np.asarray(y)
+    bins = np.minimum((confidence * n_bins).astype(int), n_bins - 1)
+    error = 0.0
+    for b in range(n_bins):
+        in_bin = bins == b
+        if in_bin.any():
+            error += in_bin.mean() * abs(correct[in_bin].mean() - confidence[in_bin].mean())
+    return float(error)
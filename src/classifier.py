@@ -3,6 +3,12 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.calibration import CalibratedClassifierCV
 import joblib
 import os
+from src.keyword_matcher import KeywordMatcher
+from src.compiled_model import compile_model, save_compiled, load_compiled, read_artifact_metadata
+from src.model_store import ModelStore
+from src.calibration import CALIBRATION_MODES, CALIBRATION_METHODS, fit_calibrated_forest
+from src.incremental import incremental_update
+from src.feature_extraction import FeatureExtractor
 
 
 class WasteClassifier:
@@ -10,26 +16,135 @@ class WasteClassifier:
     DANGER_THRESHOLD = 0.25
     CONFIDENCE_THRESHOLD = 0.50
     TOP2_TIE_THRESHOLD = 0.05
+    TIE_MATCHER = KeywordMatcher({
+        'Reciclável': ['cano', 'canos', 'tubo', 'tubos', 'pvc', 'conduíte', 'conduite',
+                       'encanamento', 'conexões', 'conexoes', 'esgoto', 'tubulação', 'tubulacao']
+    })
     
-    def __init__(self, model_path='models/waste_classifier.pkl'):
-        self.model_path = model_path
-        self.model = None
-        self.load_model()
+    @classmethod
+    def tie_hint(cls, text):
+        # True se o texto pode decidir um empate a favor de 'Reciclável'
+        # (ver _apply_decision_rules_batch).
+        return bool(text) and cls.TIE_MATCHER.count_batch([text])[0, 0] > 0
     
-    def load_model(self):
-        if os.path.exists(self.model_path):
-            try:
-                self.model = joblib.load(self.model_path)
-                print(f"Modelo carregado de {self.model_path}")
-            except Exception as e:
-                print(f"Erro ao carregar modelo: {e}")
-                self.model = None
+    def __init__(self, model_root='models', version=None):
+        # A versão (por padrão a apontada por models/current) é fixada aqui;
+        # nada mais é lido do disco: o artefato compilado (ou o .pkl, se o
+        # artefato faltar ou estiver desatualizado) é carregado na primeira
+        # predição ou consulta a has_model.
+        self.store = ModelStore(model_root)
+        # Modelos anteriores ao versionamento (models/waste_classifier.pkl)
+        # foram treinados com features da versão 1 e não são mais carregados.
+        self.version = version or self.store.current_version()
+        if self.version is not None:
+            self.model_path = self.store.model_path(self.version)
+            self.artifact_path = self.store.artifact_path(self.version)
         else:
+            self.model_path = None
+            self.artifact_path = None
+        self._model = None
+        self._compiled = None
+        self._model_loaded = False
+        self._compiled_loaded = False
+    
+    @property
+    def model(self):
+        # Modelo sklearn; só é desserializado quando realmente necessário.
+        if not self._model_loaded:
+            self._model_loaded = True
+            self._model = self._load_pickle()
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+        self._model_loaded = True
+    
+    @property
+    def compiled(self):
+        if not self._compiled_loaded:
+            self._compiled_loaded = True
+            self._compiled = self._load_artifact()
+            if self._compiled is None and self.model is not None:
+                self._compiled = self._compile(self.model)
+        return self._compiled
+    
+    @property
+    def has_model(self):
+        return self.compiled is not None or self.model is not None
+    
+    def load_model(self):
+        # Carga imediata, descartando o que já estiver em memória.
+        self._model_loaded = False
+        self._compiled_loaded = False
+        return self.has_model
+    
+    def _source_stamp(self, model_path=None):
+        model_path = model_path or self.model_path
+        stat = os.stat(model_path)
+        return {'file': os.path.basename(model_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    
+    def _feature_version(self):
+        # Versão das features com que o modelo foi treinado; modelos sem
+        # registro (anteriores ao versionamento das features) são da versão 1.
+        info = self.store.read_info(self.version) or {}
+        return info.get('feature_version', 1)
+    
+    def _load_pickle(self):
+        if self.model_path is None:
+            print(f"Nenhuma versão de modelo publicada em {self.store.root}")
+            return None
+        if not os.path.exists(self.model_path):
             print(f"Modelo não encontrado em {self.model_path}")
-            self.model = None
+            return None
+        if self._feature_version() != FeatureExtractor.FEATURE_VERSION:
+            print(f"⚠️ Modelo em {self.model_path} usa features da versão {self._feature_version()} "
+                  f"(atual: {FeatureExtractor.FEATURE_VERSION}) e não será usado; "
+                  f"execute o treino completo (train_model_real.py).")
+            return None
+        try:
+            model = joblib.load(self.model_path)
+            print(f"Modelo carregado de {self.model_path}")
+            return model
+        except Exception as e:
+            print(f"Erro ao carregar modelo: {e}")
+            return None
+    
+    def _load_artifact(self):
+        if self.artifact_path is None:
+            return None
+        metadata = read_artifact_metadata(self.artifact_path)
+        if metadata is None or not os.path.exists(self.model_path):
+            return None
+        if self._feature_version() != FeatureExtractor.FEATURE_VERSION:
+            # O aviso sai na tentativa com o .pkl.
+            return None
+        if metadata.get('source') != self._source_stamp():
+            print(f"Artefato compilado desatualizado em {self.artifact_path}; usando {self.model_path}")
+            return None
+        try:
+            compiled = load_compiled(self.artifact_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Erro ao carregar artefato compilado: {e}")
+            return None
+        print(f"Modelo compilado carregado de {self.artifact_path}")
+        return compiled
     
-    def train(self, X, y, calibrate=True):
-        base_model = RandomForestClassifier(
+    def _compile(self, model):
+        # Versão em arrays planos usada na predição; se o modelo não puder ser
+        # compilado, a predição continua usando o sklearn.
+        try:
+            return compile_model(model)
+        except ValueError as e:
+            print(f"Modelo não compilado, usando sklearn: {e}")
+            return None
+    
+    def compile(self):
+        self._compiled = self._compile(self._model) if self._model is not None else None
+        self._compiled_loaded = True
+    
+    def _new_forest(self):
+        return RandomForestClassifier(
             n_estimators=200,
             max_depth=25,
             min_samples_split=3,
@@ -39,156 +154,160 @@ class WasteClassifier:
             class_weight='balanced',
             n_jobs=-1
         )
+    
+    def train(self, X, y, calibrate=True, calibration_mode='cv', calibration_method='isotonic'):
+        # calibration_mode='cv' mantém as três florestas do CalibratedClassifierCV;
+        # 'oob' e 'holdout' treinam uma única floresta e calibram suas saídas.
+        if calibration_mode not in CALIBRATION_MODES:
+            raise ValueError(f"Modo de calibração desconhecido: {calibration_mode}")
+        if calibration_method not in CALIBRATION_METHODS:
+            raise ValueError(f"Método de calibração desconhecido: {calibration_method}")
+        if calibrate and calibration_mode == 'cv' and calibration_method == 'temperature':
+            # CalibratedClassifierCV só aceita isotonic e sigmoid.
+            raise ValueError("Calibração por temperatura exige calibration_mode='oob' ou 'holdout'")
         
-        base_model.fit(X, y)
-        
-        if calibrate:
-            self.model = CalibratedClassifierCV(base_model, method='isotonic', cv=3)
+        if not calibrate:
+            self.model = self._new_forest()
+            self.model.fit(X, y)
+        elif calibration_mode == 'cv':
+            self.model = CalibratedClassifierCV(self._new_forest(), method=calibration_method, cv=3)
             self.model.fit(X, y)
         else:
-            self.model = base_model
+            self.model = fit_calibrated_forest(self._new_forest(), X, y, mode=calibration_mode,
+                                               method=calibration_method)
         
+        self.compile()
         print("Modelo treinado com sucesso!")
     
-    def save_model(self):
+    def update(self, X, y, n_trees=50, max_trees=600):
+        # Re-treino incremental sobre o modelo carregado: acrescenta n_trees
+        # árvores treinadas em (X, y) e recalibra (ver src/incremental.py).
+        # (X, y) deve trazer amostras de todas as classes.
+        if self.model is None:
+            raise ValueError("Nenhum modelo para atualizar")
+        self.model = incremental_update(self.model, X, y, n_trees=n_trees, max_trees=max_trees,
+                                        random_state=42)
+        self.compile()
+        print(f"Modelo atualizado: {len(self.model.forest.estimators_)} árvores")
+    
+    def save_model(self, activate=True, keep_versions=5, info=None):
+        # Publica uma nova versão em models/versions/ e, com activate=True,
+        # aponta models/current para ela. `info` acrescenta campos ao
+        # info.json da versão. Devolve a versão publicada.
         if self.model is None:
             print("Nenhum modelo para salvar!")
-            return
+            return None
         
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        version = self.store.new_version()
+        staging = self.store.stage(version)
+        model_path = os.path.join(staging, ModelStore.MODEL_FILE)
+        joblib.dump(self.model, model_path)
+        if self.compiled is not None:
+            save_compiled(self.compiled, os.path.join(staging, ModelStore.COMPILED_DIR),
+                          source=self._source_stamp(model_path))
         
-        joblib.dump(self.model, self.model_path)
-        print(f"Modelo salvo em {self.model_path}")
+        info = dict(info or {},
+                    model=type(self.model).__name__,
+                    compiled=self.compiled is not None,
+                    feature_version=FeatureExtractor.FEATURE_VERSION,
+                    n_features=int(getattr(self.compiled, 'n_features', 0) or 0))
+        self.store.publish(version, staging, info, activate=activate)
+        self.version = version
+        self.model_path = self.store.model_path(version)
+        self.artifact_path = self.store.artifact_path(version)
+        print(f"Modelo salvo em {self.model_path} (versão {version})")
+        
+        if keep_versions:
+            self.store.prune(keep=keep_versions)
+        return version
     
     def predict(self, features, text=""):
-        if self.model is None:
-            return self._fallback_prediction(features, text)
-        
         if len(features.shape) == 1:
             features = features.reshape(1, -1)
+        return self.predict_batch(features[:1], [text])[0]
+    
+    def predict_batch(self, X, texts=None):
+        # Uma única chamada a predict_proba para as N linhas; as regras de
+        # decisão são aplicadas como máscaras sobre a matriz N x 4.
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if texts is None or isinstance(texts, str):
+            texts = [texts or ""] * len(X)
+        texts = list(texts)
+        if len(texts) != len(X):
+            raise ValueError("texts deve ter um item por linha de X")
         
-        probabilities = self.model.predict_proba(features)[0]
-        predicted_class, confidence, explanation, needs_feedback = self._apply_decision_rules(probabilities, text)
-        prob_dict = {class_name: float(prob) 
-                     for class_name, prob in zip(self.CLASSES, probabilities)}
-        disposal_tip = self._get_disposal_tip(predicted_class)
+        if not self.has_model:
+            return self._fallback_prediction_batch(X)
         
-        return {
-            'classe': predicted_class,
-            'confianca': float(confidence),
-            'probabilidades': prob_dict,
-            'explicacao': explanation,
-            'dica_descarte': disposal_tip,
-            'needs_feedback': needs_feedback
-        }
+        probabilities = np.zeros((len(X), len(self.CLASSES)))
+        if len(X):
+            # As colunas de predict_proba seguem model.classes_ (ordem alfabética),
+            # não CLASSES; as regras abaixo indexam pela ordem de CLASSES.
+            engine = self.compiled if self.compiled is not None else self.model
+            model_proba = engine.predict_proba(X)
+            model_classes = list(engine.classes_)
+            for j, class_name in enumerate(self.CLASSES):
+                if class_name in model_classes:
+                    probabilities[:, j] = model_proba[:, model_classes.index(class_name)]
+        return self._apply_decision_rules_batch(probabilities, texts)
     
-    def _apply_decision_rules(self, probabilities, text=""):
-        sorted_indices = np.argsort(probabilities)[::-1]
-        top2_probs = probabilities[sorted_indices[:2]]
-        top2_classes = [self.CLASSES[i] for i in sorted_indices[:2]]
-        
-        max_prob = probabilities[sorted_indices[0]]
-        predicted_class = top2_classes[0]
+    def _apply_decision_rules_batch(self, probabilities, texts):
+        n = len(probabilities)
+        rows = np.arange(n)
+        order = np.argsort(probabilities, axis=1)[:, ::-1]
+        top, second = order[:, 0], order[:, 1]
+        max_prob = probabilities[rows, top]
+        second_prob = probabilities[rows, second]
         danger_idx = self.CLASSES.index('Perigoso')
-        danger_prob = probabilities[danger_idx]
-        
-        needs_feedback = False
+        recyclable_idx = self.CLASSES.index('Reciclável')
+        danger_prob = probabilities[:, danger_idx]
         
-        if max_prob < self.CONFIDENCE_THRESHOLD:
-            needs_feedback = True
-            explanation = (
-                f"⚠️ Baixa confiança na classificação ({max_prob:.1%}). "
-                f"Por favor, confirme se a classificação está correta."
-            )
-            return predicted_class, max_prob, explanation, needs_feedback
+        classes = top.copy()
+        confidence = max_prob.copy()
+        rules = np.full(n, 'confiante', dtype=object)
         
-        tie_detected = (top2_probs[0] - top2_probs[1]) < self.TOP2_TIE_THRESHOLD
+        low_confidence = max_prob < self.CONFIDENCE_THRESHOLD
+        rules[low_confidence] = 'baixa_confianca'
         
-        if tie_detected and text:
-            text_lower = text.lower()
-            recyclable_keywords = ['cano', 'canos', 'tubo', 'tubos', 'pvc', 'conduíte', 'conduite', 
-                                 'encanamento', 'conexões', 'conexoes', 'esgoto', 'tubulação', 'tubulacao']
-            dangerous_keywords = ['bateria', 'pilha', 'tinta', 'solvente', 'veneno', 'inseticida',
-                                'pesticida', 'remédio', 'medicamento', 'lâmpada', 'fluorescente',
-                                'termômetro', 'mercúrio', 'tóxico', 'corrosivo', 'inflamável', 'químico']
-            
-            recyclable_score = sum(1 for kw in recyclable_keywords if kw in text_lower)
-            dangerous_score = sum(1 for kw in dangerous_keywords if kw in text_lower)
-            
-            if recyclable_score > 0 and 'Reciclável' in top2_classes:
-                predicted_class = 'Reciclável'
-                max_prob = probabilities[self.CLASSES.index('Reciclável')]
-                explanation = (
-                    f"✓ Classificação: {predicted_class} (confiança: {max_prob:.1%}). "
-                    f"Desempate baseado em texto indicativo."
-                )
-                return predicted_class, max_prob, explanation, needs_feedback
+        tie = (~low_confidence & ((max_prob - second_prob) < self.TOP2_TIE_THRESHOLD)
+               & np.array([bool(text) for text in texts], dtype=bool)
+               & ((top == recyclable_idx) | (second == recyclable_idx)))
+        tie_rows = np.flatnonzero(tie)
+        if len(tie_rows):
+            recyclable_score = self.TIE_MATCHER.count_batch(texts[i] for i in tie_rows)[:, 0]
+            tie[tie_rows[recyclable_score == 0]] = False
+        classes[tie] = recyclable_idx
+        confidence[tie] = probabilities[tie, recyclable_idx]
+        rules[tie] = 'desempate_texto'
         
-        if predicted_class == 'Perigoso':
-            if danger_prob < 0.40:
-                needs_feedback = True
-                explanation = (
-                    f"⚠️ Classificado como 'Perigoso' com confiança moderada ({danger_prob:.1%}). "
-                    f"Por favor, confirme se está correto."
-                )
-            else:
-                explanation = (
-                    f"✓ Classificação: {predicted_class} (confiança: {danger_prob:.1%}). "
-                    f"Evidência forte de resíduo perigoso."
-                )
-        elif danger_prob >= self.DANGER_THRESHOLD and max_prob < 0.70:
-            if danger_prob >= 0.30:
-                needs_feedback = True
-                explanation = (
-                    f"⚠️ Possível resíduo perigoso detectado ({danger_prob:.1%}). "
-                    f"Classificado como '{predicted_class}' mas verifique se não é perigoso."
-                )
-            else:
-                explanation = (
-                    f"✓ Classificação: {predicted_class} (confiança: {max_prob:.1%})."
-                )
-        else:
-            explanation = (
-                f"✓ Classificação: {predicted_class} (confiança: {max_prob:.1%})."
-            )
+        remaining = ~low_confidence & ~tie
+        predicted_danger = remaining & (top == danger_idx)
+        danger_moderate = predicted_danger & (danger_prob < 0.40)
+        rules[danger_moderate] = 'perigoso_moderado'
+        rules[predicted_danger & ~danger_moderate] = 'perigoso_forte'
+        possible_danger = (remaining & ~predicted_danger & (danger_prob >= self.DANGER_THRESHOLD)
+                           & (max_prob < 0.70) & (danger_prob >= 0.30))
+        rules[possible_danger] = 'possivel_perigoso'
         
-        return predicted_class, max_prob, explanation, needs_feedback
+        needs_feedback = low_confidence | danger_moderate | possible_danger
+        return BatchPrediction(self, classes, confidence, probabilities, needs_feedback, rules)
     
-    def _fallback_prediction(self, features, text=""):
-        text_scores = features[-4:]
-        
-        if text_scores.sum() == 0:
-            return {
-                'classe': 'Desconhecido',
-                'confianca': 0.0,
-                'probabilidades': {c: 0.25 for c in self.CLASSES},
-                'explicacao': '⚠️ Modelo não disponível e nenhuma palavra-chave identificada.',
-                'dica_descarte': 'Consulte serviço de coleta local para orientação.',
-                'needs_feedback': True
-            }
-        
-        max_idx = np.argmax(text_scores)
-        predicted_class = self.CLASSES[max_idx]
-        confidence = text_scores[max_idx]
-        
-        prob_dict = {class_name: float(score) 
-                     for class_name, score in zip(self.CLASSES, text_scores)}
-        
-        explanation = (
-            f"⚠️ Classificação baseada apenas em texto (modelo não disponível). "
-            f"Confiança: {confidence:.1%}"
-        )
-        
-        disposal_tip = self._get_disposal_tip(predicted_class)
+    def _fallback_prediction_batch(self, X):
+        n = len(X)
+        text_scores = X[:, -4:].astype(np.float64) if n else np.zeros((0, len(self.CLASSES)))
+        no_text = text_scores.sum(axis=1) == 0
+        classes = np.argmax(text_scores, axis=1) if n else np.zeros(0, dtype=np.intp)
+        confidence = text_scores[np.arange(n), classes]
+        probabilities = text_scores.copy()
         
-        return {
-            'classe': predicted_class,
-            'confianca': float(confidence),
-            'probabilidades': prob_dict,
-            'explicacao': explanation,
-            'dica_descarte': disposal_tip,
-            'needs_feedback': confidence < 0.6
-        }
+        classes[no_text] = -1
+        confidence[no_text] = 0.0
+        probabilities[no_text] = 0.25
+        rules = np.where(no_text, 'sem_modelo_sem_texto', 'sem_modelo_texto').astype(object)
+        needs_feedback = no_text | (confidence < 0.6)
+        return BatchPrediction(self, classes, confidence, probabilities, needs_feedback, rules)
     
     def _get_disposal_tip(self, waste_class):
         tips = {
@@ -217,3 +336,87 @@ class WasteClassifier:
         
         return tips.get(waste_class, tips['Desconhecido'])
 
+
+
+class BatchPrediction:
+    # Resultado de WasteClassifier.predict_batch. Guarda apenas arrays; as
+    # explicações e os dicionários por amostra são montados sob demanda.
+    EXPLANATIONS = {
+        'baixa_confianca': (
+            "⚠️ Baixa confiança na classificação ({confianca:.1%}). "
+            "Por favor, confirme se a classificação está correta."
+        ),
+        'desempate_texto': (
+            "✓ Classificação: {classe} (confiança: {confianca:.1%}). "
+            "Desempate baseado em texto indicativo."
+        ),
+        'perigoso_moderado': (
+            "⚠️ Classificado como 'Perigoso' com confiança moderada ({perigo:.1%}). "
+            "Por favor, confirme se está correto."
+        ),
+        'perigoso_forte': (
+            "✓ Classificação: {classe} (confiança: {perigo:.1%}). "
+            "Evidência forte de resíduo perigoso."
+        ),
+        'possivel_perigoso': (
+            "⚠️ Possível resíduo perigoso detectado ({perigo:.1%}). "
+            "Classificado como '{classe}' mas verifique se não é perigoso."
+        ),
+        'confiante': "✓ Classificação: {classe} (confiança: {confianca:.1%}).",
+        'sem_modelo_texto': (
+            "⚠️ Classificação baseada apenas em texto (modelo não disponível). "
+            "Confiança: {confianca:.1%}"
+        ),
+        'sem_modelo_sem_texto': '⚠️ Modelo não disponível e nenhuma palavra-chave identificada.'
+    }
+    
+    def __init__(self, classifier, classes, confidence, probabilities, needs_feedback, rules):
+        self.classifier = classifier
+        self.classes = classes
+        self.confidence = confidence
+        self.probabilities = probabilities
+        self.needs_feedback = needs_feedback
+        self.rules = rules
+    
+    def __len__(self):
+        return len(self.classes)
+    
+    @property
+    def labels(self):
+        # classes == -1 marca 'Desconhecido' (sem modelo e sem palavras-chave).
+        names = np.array(self.classifier.CLASSES + ['Desconhecido'], dtype=object)
+        return names[self.classes]
+    
+    def label(self, i):
+        return self.classifier.CLASSES[self.classes[i]] if self.classes[i] >= 0 else 'Desconhecido'
+    
+    def explanation(self, i):
+        rule = self.rules[i]
+        if rule == 'sem_modelo_sem_texto':
+            return self.EXPLANATIONS[rule]
+        danger_idx = self.classifier.CLASSES.index('Perigoso')
+        return self.EXPLANATIONS[rule].format(
+            classe=self.label(i),
+            confianca=self.confidence[i],
+            perigo=self.probabilities[i, danger_idx]
+        )
+    
+    def __getitem__(self, i):
+        predicted_class = self.label(i)
+        if self.rules[i] == 'sem_modelo_sem_texto':
+            disposal_tip = 'Consulte serviço de coleta local para orientação.'
+        else:
+            disposal_tip = self.classifier._get_disposal_tip(predicted_class)
+        return {
+            'classe': predicted_class,
+            'confianca': float(self.confidence[i]),
+            'probabilidades': {class_name: float(prob)
+                               for class_name, prob in zip(self.classifier.CLASSES, self.probabilities[i])},
+            'explicacao': self.explanation(i),
+            'dica_descarte': disposal_tip,
+            'needs_feedback': bool(self.needs_feedback[i])
+        }
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,245 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from functools import partial
+import numpy as np
+from src.classifier import WasteClassifier
+from src.dataset_manifest import VALID_EXTENSIONS
+from src.feature_extraction import FeatureExtractor
+from src.image_upload import decode_upload
+from src.model_store import ModelStore
+from src.parallel import default_workers, imap_chunks, iter_chunks
+
+
+# Classificação offline de muitos arquivos:
+#
+#   python -m src.cli classify fotos/ 'arquivo/**/*.jpg' -o saida.csv
+#   find /dados -name '*.jpg' | python -m src.cli classify - -o saida.jsonl --resume
+#
+# As entradas são enumeradas sob demanda em ordem estável (diretórios em
+# ordem alfabética), divididas em blocos e classificadas em processos
+# separados, cada um com seu extrator e o modelo mapeado em memória. As
+# linhas saem na ordem de entrada, gravadas à medida que os blocos terminam.
+# A cada bloco gravado o checkpoint (<saída>.ckpt) registra quantas entradas
+# já foram concluídas e o tamanho da saída; com --resume a execução pula
+# essas entradas e descarta o que foi gravado depois do último checkpoint.
+
+OUTPUT_FORMATS = ('csv', 'jsonl')
+COLUMNS = ['caminho', 'classe', 'confianca'] + WasteClassifier.CLASSES + ['revisar', 'erro', 'tempo_ms', 'versao']
+
+
+def iter_inputs(specs, stdin=None):
+    # Caminhos de arquivos a partir de diretórios, padrões glob, arquivos ou
+    # '-' (uma linha por caminho na entrada padrão).
+    for spec in specs:
+        if spec == '-':
+            for line in stdin or sys.stdin:
+                path = line.rstrip('\r\n')
+                if path:
+                    yield path
+        elif os.path.isdir(spec):
+            for root, dirs, files in os.walk(spec):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(VALID_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(spec):
+            for path in sorted(glob.iglob(spec, recursive=True)):
+                if os.path.isfile(path):
+                    yield path
+        else:
+            yield spec
+
+
+_worker = None
+
+
+def _worker_state(model_root, version):
+    # Extrator e classificador criados uma vez por processo.
+    global _worker
+    if _worker is None:
+        classifier = WasteClassifier(model_root, version)
+        # As mensagens da carga não podem se misturar à saída em stdout.
+        with redirect_stdout(sys.stderr):
+            classifier.has_model
+        _worker = (FeatureExtractor(), classifier)
+    return _worker
+
+
+def classify_paths(model_root, version, text, paths):
+    # Uma linha (dict) por caminho. tempo_ms = leitura e decodificação do
+    # arquivo mais a parte dele na extração e na predição do bloco.
+    extractor, classifier = _worker_state(model_root, version)
+    rows = []
+    images = []
+    for path in paths:
+        start = time.perf_counter()
+        row = dict.fromkeys(COLUMNS, "")
+        row.update(caminho=path, versao=classifier.version or "")
+        try:
+            with open(path, 'rb') as f:
+                images.append(decode_upload(f.read(), extractor.plan.image_size))
+            row['_ok'] = True
+        except (OSError, ValueError) as e:
+            row['erro'] = str(e)
+        row['tempo_ms'] = (time.perf_counter() - start) * 1000
+        rows.append(row)
+
+    decoded = [row for row in rows if row.pop('_ok', False)]
+    if decoded:
+        start = time.perf_counter()
+        features = np.hstack([extractor.extract_visual_features_batch(images),
+                              np.tile(extractor.extract_text_features(text), (len(images), 1))])
+        batch = classifier.predict_batch(features, text)
+        shared_ms = (time.perf_counter() - start) * 1000 / len(decoded)
+        for i, row in enumerate(decoded):
+            row.update(classe=batch.label(i), confianca=round(float(batch.confidence[i]), 6),
+                       revisar=bool(batch.needs_feedback[i]))
+            row.update({class_name: round(float(p), 6)
+                        for class_name, p in zip(classifier.CLASSES, batch.probabilities[i])})
+            row['tempo_ms'] += shared_ms
+    for row in rows:
+        row['tempo_ms'] = round(row['tempo_ms'], 2)
+    return rows
+
+
+class OutputWriter:
+    def __init__(self, stream, output_format):
+        self.stream = stream
+        self.output_format = output_format
+        self._csv = csv.DictWriter(stream, COLUMNS) if output_format == 'csv' else None
+
+    def header(self):
+        if self._csv is not None:
+            self._csv.writeheader()
+
+    def write(self, rows):
+        if self._csv is not None:
+            self._csv.writerows(rows)
+        else:
+            for row in rows:
+                self.stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_checkpoint(path, checkpoint):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def classify_command(args):
+    output_format = args.format or ('jsonl' if args.output and args.output.endswith('.jsonl') else 'csv')
+    if args.resume and not args.output:
+        raise SystemExit("--resume exige --output")
+    version = ModelStore(args.model_root).current_version()
+    workers = args.workers or default_workers()
+    inputs = iter_inputs(args.inputs or ['-'])
+
+    checkpoint_path = args.output + '.ckpt' if args.output else None
+    checkpoint = read_checkpoint(checkpoint_path) if args.resume else None
+    if checkpoint is not None:
+        if checkpoint.get('inputs') != args.inputs or checkpoint.get('format') != output_format:
+            raise SystemExit("O checkpoint é de outra execução (entradas ou formato diferentes)")
+        if not os.path.exists(args.output) or os.path.getsize(args.output) < checkpoint['output_bytes']:
+            raise SystemExit("A saída do checkpoint sumiu ou foi truncada; não é possível retomar")
+        version = checkpoint['version'] or version
+
+    # Sem modelo tudo sairia como 'Desconhecido'; falha antes de ler as entradas.
+    classifier = WasteClassifier(args.model_root, version)
+    with redirect_stdout(sys.stderr):
+        if not classifier.has_model:
+            raise SystemExit("Nenhum modelo utilizável; execute o treino (train_model_real.py)")
+
+    done = 0
+    if checkpoint is not None:
+        # Pula o que já foi gravado e confere que a entrada é a mesma.
+        last = None
+        for last in inputs:
+            done += 1
+            if done == checkpoint['done']:
+                break
+        if done != checkpoint['done'] or last != checkpoint['last']:
+            raise SystemExit("As entradas mudaram desde o checkpoint; não é possível retomar")
+        print(f"Retomando após {done} arquivos", file=sys.stderr)
+
+    if args.output:
+        stream = open(args.output, 'r+' if checkpoint is not None else 'w', encoding='utf-8', newline='')
+        if checkpoint is not None:
+            # Descarta linhas gravadas depois do último checkpoint.
+            stream.seek(checkpoint['output_bytes'])
+            stream.truncate()
+        if checkpoint is None and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    else:
+        stream = sys.stdout
+    writer = OutputWriter(stream, output_format)
+    if checkpoint is None:
+        writer.header()
+
+    start = time.perf_counter()
+    processed = errors = 0
+    last = checkpoint['last'] if checkpoint is not None else None
+    try:
+        chunks = iter_chunks(inputs, args.chunk_size)
+        func = partial(classify_paths, args.model_root, version, args.text)
+        for rows in imap_chunks(func, chunks, workers=workers, processes=workers > 1):
+            writer.write(rows)
+            stream.flush()
+            processed += len(rows)
+            errors += sum(1 for row in rows if row['erro'])
+            last = rows[-1]['caminho']
+            if checkpoint_path:
+                write_checkpoint(checkpoint_path, {'inputs': args.inputs, 'format': output_format,
+                                                   'version': version, 'done': done + processed,
+                                                   'last': last, 'output_bytes': stream.tell()})
+            if args.progress and processed % args.progress < len(rows):
+                elapsed = time.perf_counter() - start
+                print(f"{done + processed} arquivos ({processed / elapsed:.1f}/s, {errors} erros)",
+                      file=sys.stderr)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"Concluído: {processed} arquivos em {elapsed:.1f}s ({rate:.1f}/s), {errors} erros, "
+          f"modelo {version}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description="Ferramentas de linha de comando do GreenTrash.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    classify = commands.add_parser('classify', help="classifica arquivos de imagem em lote")
+    classify.add_argument('inputs', nargs='*',
+                          help="diretórios, padrões glob ou arquivos; '-' (padrão) lê caminhos da entrada padrão")
+    classify.add_argument('-o', '--output', help="arquivo de saída (padrão: saída padrão)")
+    classify.add_argument('--format', choices=OUTPUT_FORMATS, help="csv ou jsonl (padrão: pela extensão)")
+    classify.add_argument('--text', default="", help="descrição aplicada a todas as imagens")
+    classify.add_argument('--workers', type=int, default=None, help="processos (padrão: GREENTRASH_WORKERS ou CPUs)")
+    classify.add_argument('--chunk-size', type=int, default=32, help="arquivos por bloco")
+    classify.add_argument('--model-root', default='models')
+    classify.add_argument('--resume', action='store_true', help="retoma a partir do checkpoint de --output")
+    classify.add_argument('--progress', type=int, default=1000, help="mostra o progresso a cada N arquivos (0 desliga)")
+    classify.set_defaults(handler=classify_command)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
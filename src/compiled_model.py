@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import RandomForestClassifier
+from src.calibration import CalibratedForest, apply_calibration
+
+
+# Versão compilada do modelo salvo por WasteClassifier.train: todas as árvores
+# de todas as florestas ficam concatenadas em arrays planos (estrutura de
+# arrays) e os calibradores viram tabelas de pontos para np.interp
+# (isotônica) ou parâmetros (sigmoide, temperatura). A predição
+# percorre todas as árvores de uma vez com NumPy, sem a validação e o
+# despacho do joblib que o sklearn faz a cada chamada.
+
+
+class CompiledEnsemble:
+    # Nomes dos arrays que descrevem o modelo (ver to_arrays).
+    ARRAYS = ('classes', 'feature', 'threshold', 'children', 'value', 'roots',
+              'member_starts', 'calibration_offsets', 'calibration_x', 'calibration_y',
+              'sigmoid_a', 'sigmoid_b', 'temperature')
+    CALIBRATIONS = ('none', 'isotonic', 'sigmoid', 'temperature')
+
+    def __init__(self, arrays, calibration='none', max_depth=0, n_features=None, block_size=128):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        if calibration not in self.CALIBRATIONS:
+            raise ValueError(f"Calibração desconhecida: {calibration}")
+        self.calibration = calibration
+        self.max_depth = int(max_depth)
+        self.n_features = n_features
+        self.block_size = block_size
+        self.classes_ = np.asarray(self.classes)
+        self.n_members = len(self.member_starts)
+        self._member_sizes = np.diff(np.append(self.member_starts, len(self.roots)))
+
+    def to_arrays(self):
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def metadata(self):
+        return {'calibration': self.calibration, 'max_depth': self.max_depth, 'n_features': self.n_features}
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.n_features is not None and X.shape[1] != self.n_features:
+            raise ValueError(f"X tem {X.shape[1]} features, mas o modelo espera {self.n_features}")
+        # As árvores do sklearn comparam as features em float32.
+        X = X.astype(np.float32)
+        if len(X) <= self.block_size:
+            return self._predict_block(X)
+        return np.vstack([self._predict_block(X[i:i + self.block_size])
+                          for i in range(0, len(X), self.block_size)])
+
+    def _leaves(self, X):
+        n_samples, n_features = X.shape
+        flat = X.ravel()
+        row_offsets = (np.arange(n_samples) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n_samples, len(self.roots)))
+        # Folhas apontam para si mesmas, então max_depth passos bastam para
+        # todas as árvores chegarem a uma folha.
+        for _ in range(self.max_depth):
+            go_left = flat.take(row_offsets + self.feature.take(node)) <= self.threshold.take(node)
+            node = self.children.take(2 * node + go_left)
+        return node
+
+    def _predict_block(self, X):
+        leaf_values = self.value[self._leaves(X)]
+        member_proba = np.add.reduceat(leaf_values, self.member_starts, axis=1)
+        member_proba /= self._member_sizes[None, :, None]
+
+        if self.calibration == 'none':
+            return member_proba.mean(axis=1)
+
+        n_classes = len(self.classes_)
+        total = np.zeros((len(X), n_classes))
+        for member in range(self.n_members):
+            tables = None
+            if self.calibration == 'isotonic':
+                bounds = self.calibration_offsets[member * n_classes:(member + 1) * n_classes + 1]
+                tables = [(self.calibration_x[start:stop], self.calibration_y[start:stop])
+                          for start, stop in zip(bounds[:-1], bounds[1:])]
+            total += apply_calibration(member_proba[:, member], self.calibration, tables,
+                                       self.sigmoid_a[member], self.sigmoid_b[member],
+                                       self.temperature[member])
+        return total / self.n_members
+
+
+def _forest_members(model):
+    # Lista de (floresta, calibradores) e o método de calibração comum.
+    if isinstance(model, RandomForestClassifier):
+        return [(model, None)], 'none'
+    if isinstance(model, CalibratedForest):
+        return [(model.forest, model)], model.method
+    if isinstance(model, CalibratedClassifierCV):
+        methods = {calibrated.method for calibrated in model.calibrated_classifiers_}
+        if len(methods) != 1 or not methods <= {'isotonic', 'sigmoid'}:
+            raise ValueError(f"Calibração não suportada: {sorted(methods)}")
+        members = [(calibrated.estimator, calibrated.calibrators)
+                   for calibrated in model.calibrated_classifiers_]
+        if not all(isinstance(forest, RandomForestClassifier) for forest, _ in members):
+            raise ValueError("Apenas florestas aleatórias podem ser compiladas")
+        return members, methods.pop()
+    raise ValueError(f"Modelo não suportado: {type(model).__name__}")
+
+
+def compile_model(model):
+    # Converte RandomForestClassifier, CalibratedClassifierCV(RandomForest) ou
+    # CalibratedForest em CompiledEnsemble. Levanta ValueError para outros modelos.
+    members, calibration = _forest_members(model)
+    classes = np.asarray(model.classes_)
+    n_classes = len(classes)
+    if n_classes < 3:
+        raise ValueError("O modelo compilado exige ao menos 3 classes")
+
+    feature, threshold, left, right, value = [], [], [], [], []
+    roots, member_starts = [], []
+    calibration_offsets = [0]
+    calibration_x, calibration_y = [], []
+    sigmoid_a = np.zeros((len(members), n_classes))
+    sigmoid_b = np.zeros((len(members), n_classes))
+    temperature = np.ones(len(members))
+    offset = 0
+    max_depth = 0
+
+    for member, (forest, calibrators) in enumerate(members):
+        if not np.array_equal(forest.classes_, classes):
+            raise ValueError("Todas as florestas precisam conhecer todas as classes")
+        member_starts.append(len(roots))
+        for tree in forest.estimators_:
+            t = tree.tree_
+            nodes = np.arange(t.node_count)
+            is_leaf = t.children_left == -1
+            feature.append(np.where(is_leaf, 0, t.feature).astype(np.int64))
+            threshold.append(np.where(is_leaf, 0.0, t.threshold))
+            left.append(np.where(is_leaf, nodes, t.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, t.children_right) + offset)
+            proba = t.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = proba.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0] = 1
+            value.append(proba / normalizer)
+            roots.append(offset)
+            offset += t.node_count
+            max_depth = max(max_depth, t.max_depth)
+
+        if isinstance(calibrators, CalibratedForest):
+            if calibration == 'temperature':
+                temperature[member] = calibrators.temperature
+            elif calibration == 'sigmoid':
+                sigmoid_a[member], sigmoid_b[member] = calibrators.sigmoid_a, calibrators.sigmoid_b
+            else:
+                for x, y in calibrators.isotonic_tables:
+                    calibration_x.append(x)
+                    calibration_y.append(y)
+                    calibration_offsets.append(calibration_offsets[-1] + len(x))
+            continue
+
+        for k, calibrator in enumerate(calibrators or []):
+            if calibration == 'isotonic':
+                calibration_x.append(np.asarray(calibrator.X_thresholds_, dtype=np.float64))
+                calibration_y.append(np.asarray(calibrator.y_thresholds_, dtype=np.float64))
+                calibration_offsets.append(calibration_offsets[-1] + len(calibration_x[-1]))
+            else:
+                sigmoid_a[member, k] = calibrator.a_
+                sigmoid_b[member, k] = calibrator.b_
+
+    arrays = {
+        'classes': classes,
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        # Filhos intercalados (direito, esquerdo): o próximo nó é children[2 * nó + go_left].
+        'children': np.stack([np.concatenate(right), np.concatenate(left)], axis=1).ravel().astype(np.int64),
+        'value': np.concatenate(value),
+        'roots': np.asarray(roots, dtype=np.int64),
+        'member_starts': np.asarray(member_starts, dtype=np.int64),
+        'calibration_offsets': np.asarray(calibration_offsets, dtype=np.int64),
+        'calibration_x': np.concatenate(calibration_x) if calibration_x else np.zeros(0),
+        'calibration_y': np.concatenate(calibration_y) if calibration_y else np.zeros(0),
+        'sigmoid_a': sigmoid_a,
+        'sigmoid_b': sigmoid_b,
+        'temperature': temperature
+    }
+    return CompiledEnsemble(arrays, calibration=calibration, max_depth=max_depth,
+                            n_features=int(members[0][0].n_features_in_))
+
+
+# Artefato em disco: um .npy sem compressão por array e um metadata.json com
+# versão do formato, forma/dtype/sha256 de cada array e a origem (o .pkl do
+# qual foi compilado). Os arrays são abertos com mmap somente leitura, então a
+# carga é quase instantânea e as páginas são compartilhadas entre processos.
+
+ARTIFACT_VERSION = 1
+ARTIFACT_METADATA = 'metadata.json'
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_compiled(compiled, path, source=None):
+    # metadata.json é escrito por último: sem ele o diretório é tratado como
+    # artefato incompleto.
+    os.makedirs(path, exist_ok=True)
+    metadata_path = os.path.join(path, ARTIFACT_METADATA)
+    if os.path.exists(metadata_path):
+        os.remove(metadata_path)
+
+    arrays = {}
+    for name, array in compiled.to_arrays().items():
+        array = np.ascontiguousarray(array)
+        array_path = os.path.join(path, f'{name}.npy')
+        # Nunca reescreve no lugar: outro processo pode ter o arquivo antigo
+        # mapeado em memória, e truncá-lo derruba o leitor (SIGBUS).
+        temp_path = array_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(temp_path, array_path)
+        arrays[name] = {'dtype': array.dtype.str, 'shape': list(array.shape),
+                        'sha256': _file_sha256(array_path)}
+
+    metadata = {'version': ARTIFACT_VERSION, **compiled.metadata(), 'source': source, 'arrays': arrays}
+    temp_path = metadata_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(temp_path, metadata_path)
+    return metadata
+
+
+def read_artifact_metadata(path):
+    try:
+        with open(os.path.join(path, ARTIFACT_METADATA), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_compiled(path, mmap=True, verify=False):
+    # verify=True confere o sha256 de cada array (lê os arquivos inteiros);
+    # sem ele só forma e dtype são conferidos, pelo cabeçalho dos .npy.
+    metadata = read_artifact_metadata(path)
+    if metadata is None:
+        raise FileNotFoundError(f"Artefato compilado não encontrado em {path}")
+    if metadata.get('version') != ARTIFACT_VERSION:
+        raise ValueError(f"Versão de artefato não suportada: {metadata.get('version')}")
+
+    arrays = {}
+    for name in CompiledEnsemble.ARRAYS:
+        info = metadata['arrays'].get(name)
+        if info is None:
+            raise ValueError(f"Array ausente no artefato: {name}")
+        array_path = os.path.join(path, f'{name}.npy')
+        if verify and _file_sha256(array_path) != info['sha256']:
+            raise ValueError(f"Checksum inválido: {name}")
+        # Arrays vazios não podem ser mapeados em memória.
+        mmap_mode = 'r' if mmap and np.prod(info['shape']) > 0 else None
+        array = np.load(array_path, mmap_mode=mmap_mode, allow_pickle=False)
+        if array.dtype.str != info['dtype'] or list(array.shape) != info['shape']:
+            raise ValueError(f"Array corrompido no artefato: {name}")
+        arrays[name] = array
+
+    return CompiledEnsemble(arrays, calibration=metadata['calibration'], max_depth=metadata['max_depth'],
+                            n_features=metadata.get('n_features'))
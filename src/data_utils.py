@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-import hashlib
 import os
 from collections import Counter
 
@@ -23,27 +22,106 @@ def load_images_from_folder(folder_path, class_name):
     
     return images
 
-def calculate_image_hash(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    resized = cv2.resize(gray, (8, 8))
-    avg = resized.mean()
-    binary = (resized > avg).astype(np.uint8)
-    hash_str = ''.join(str(b) for b in binary.flatten())
-    return hashlib.md5(hash_str.encode()).hexdigest()
-
-def detect_duplicates(images_with_labels):
-    seen_hashes = {}
+HASH_METHODS = ('ahash', 'dhash', 'phash')
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+_DCT_32 = _dct_matrix(32)
+
+def _hash_thumbnail(image, method):
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    size = {'ahash': (8, 8), 'dhash': (9, 8), 'phash': (32, 32)}[method]
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float64)
+
+def image_hashes(images, method='phash'):
+    # Hashes perceptuais de 64 bits (uint64) para um lote de imagens.
+    if method not in HASH_METHODS:
+        raise ValueError(f"Método de hash desconhecido: {method}")
+    images = list(images)
+    if not images:
+        return np.zeros(0, dtype=np.uint64)
+    thumbs = np.stack([_hash_thumbnail(image, method) for image in images])
+    
+    if method == 'ahash':
+        bits = thumbs > thumbs.mean(axis=(1, 2), keepdims=True)
+    elif method == 'dhash':
+        bits = thumbs[:, :, 1:] > thumbs[:, :, :-1]
+    else:
+        low = (_DCT_32 @ thumbs @ _DCT_32.T)[:, :8, :8].reshape(len(thumbs), 64)
+        bits = low > np.median(low, axis=1, keepdims=True)
+    
+    packed = np.packbits(bits.reshape(len(thumbs), 64), axis=1)
+    return packed.view('>u8').ravel().astype(np.uint64)
+
+def calculate_image_hash(image, method='phash'):
+    return int(image_hashes([image], method)[0])
+
+def hamming_distance(hash_a, hash_b):
+    return bin(int(hash_a) ^ int(hash_b)).count('1')
+
+class HammingIndex:
+    # Multi-index hashing: o hash de 64 bits é dividido em m = max_distance // 2 + 1
+    # segmentos. Se dois hashes estão a <= max_distance bits, algum segmento
+    # difere em no máximo max_distance // m <= 1 bit (casa dos pombos), então
+    # basta consultar cada tabela com a chave exata e as chaves a 1 bit dela.
+    def __init__(self, max_distance=6):
+        if not 0 <= max_distance < 64:
+            raise ValueError("max_distance deve estar entre 0 e 63")
+        self.max_distance = max_distance
+        n_segments = max_distance // 2 + 1
+        self._segment_radius = max_distance // n_segments
+        bounds = np.linspace(0, 64, n_segments + 1).astype(int)
+        self._segments = [(int(start), (1 << int(stop - start)) - 1, int(stop - start))
+                          for start, stop in zip(bounds[:-1], bounds[1:])]
+        self._tables = [{} for _ in self._segments]
+        self._hashes = []
+    
+    def __len__(self):
+        return len(self._hashes)
+    
+    def add(self, image_hash):
+        image_hash = int(image_hash)
+        item = len(self._hashes)
+        self._hashes.append(image_hash)
+        for table, (shift, mask, _) in zip(self._tables, self._segments):
+            table.setdefault((image_hash >> shift) & mask, []).append(item)
+        return item
+    
+    def query(self, image_hash):
+        image_hash = int(image_hash)
+        candidates = set()
+        for table, (shift, mask, width) in zip(self._tables, self._segments):
+            key = (image_hash >> shift) & mask
+            candidates.update(table.get(key, ()))
+            if self._segment_radius:
+                for bit in range(width):
+                    candidates.update(table.get(key ^ (1 << bit), ()))
+        return sorted(item for item in candidates
+                      if hamming_distance(self._hashes[item], image_hash) <= self.max_distance)
+
+def deduplicate_hashes(hashes, max_distance=6):
+    # Índices a manter e índices descartados por estarem a até max_distance
+    # bits de um hash já mantido (a primeira ocorrência vence).
+    index = HammingIndex(max_distance)
+    kept = []
     duplicates = []
-    unique_images = []
-    
-    for idx, (img, label) in enumerate(images_with_labels):
-        img_hash = calculate_image_hash(img)
-        if img_hash in seen_hashes:
+    for idx, image_hash in enumerate(hashes):
+        if index.query(image_hash):
             duplicates.append(idx)
         else:
-            seen_hashes[img_hash] = idx
-            unique_images.append((img, label))
-    
+            index.add(image_hash)
+            kept.append(idx)
+    return kept, duplicates
+
+def detect_duplicates(images_with_labels, max_distance=6, method='phash'):
+    hashes = image_hashes((img for img, _ in images_with_labels), method)
+    kept, duplicates = deduplicate_hashes(hashes, max_distance)
+    unique_images = [images_with_labels[idx] for idx in kept]
     return unique_images, duplicates
 
 def assess_image_quality(image):
@@ -75,48 +153,66 @@ def filter_low_quality(images_with_labels, min_quality=0.3):
     
     return filtered, removed
 
-def augment_image(image, augmentation_type='flip'):
+AUGMENTATION_TYPES = ['flip', 'rotate_light', 'brightness', 'contrast']
+
+def augment_image(image, augmentation_type='flip', rng=None):
+    if rng is None:
+        rng = np.random
     if augmentation_type == 'flip':
         return cv2.flip(image, 1)
     elif augmentation_type == 'rotate_light':
         h, w = image.shape[:2]
-        M = cv2.getRotationMatrix2D((w/2, h/2), np.random.uniform(-15, 15), 1.0)
+        M = cv2.getRotationMatrix2D((w/2, h/2), rng.uniform(-15, 15), 1.0)
         return cv2.warpAffine(image, M, (w, h))
     elif augmentation_type == 'brightness':
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        hsv[:,:,2] = np.clip(hsv[:,:,2] * np.random.uniform(0.8, 1.2), 0, 255)
+        hsv[:,:,2] = np.clip(hsv[:,:,2] * rng.uniform(0.8, 1.2), 0, 255)
         return cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
     elif augmentation_type == 'contrast':
-        alpha = np.random.uniform(0.9, 1.1)
-        beta = np.random.uniform(-10, 10)
+        alpha = rng.uniform(0.9, 1.1)
+        beta = rng.uniform(-10, 10)
         return cv2.convertScaleAbs(image, alpha=alpha, beta=beta)
     return image
 
-def balance_classes_with_augmentation(images_with_labels, target_samples_per_class=None):
+def augmentation_rng(seed, index, copy):
+    # Um gerador por (imagem, cópia): o resultado não depende de qual worker
+    # processa a imagem nem da ordem de execução.
+    if seed is None:
+        return np.random
+    return np.random.default_rng([seed, index, copy])
+
+def random_augmentation(image, rng):
+    aug_type = rng.choice(AUGMENTATION_TYPES)
+    return augment_image(image.copy(), aug_type, rng)
+
+def augmentations_per_class(class_counts, target_samples_per_class=None):
+    if target_samples_per_class is None:
+        target_samples_per_class = max(class_counts.values())
+    
+    plan = {}
+    for class_name, current_count in class_counts.items():
+        if current_count < target_samples_per_class and current_count > 0:
+            needed = target_samples_per_class - current_count
+            plan[class_name] = max(1, min(needed // current_count, 2))
+        else:
+            plan[class_name] = 0
+    return plan
+
+def balance_classes_with_augmentation(images_with_labels, target_samples_per_class=None, seed=None):
     if len(images_with_labels) == 0:
         return images_with_labels
     
     class_counts = Counter([label for _, label in images_with_labels])
-    
-    if target_samples_per_class is None:
-        target_samples_per_class = max(class_counts.values())
+    augment_per_image = augmentations_per_class(class_counts, target_samples_per_class)
     
     augmented_data = []
-    augmentation_types = ['flip', 'rotate_light', 'brightness', 'contrast']
     
     for class_name in class_counts:
-        current_count = class_counts[class_name]
-        class_images = [(img, label) for img, label in images_with_labels if label == class_name]
-        
-        if current_count < target_samples_per_class and current_count > 0:
-            needed = target_samples_per_class - current_count
-            augment_per_image = max(1, min(needed // current_count, 2))
-            
-            for img, label in class_images:
-                for _ in range(augment_per_image):
-                    aug_type = np.random.choice(augmentation_types)
-                    aug_img = augment_image(img.copy(), aug_type)
-                    augmented_data.append((aug_img, label))
+        for index, (img, label) in enumerate(images_with_labels):
+            if label != class_name:
+                continue
+            for copy in range(augment_per_image[class_name]):
+                rng = augmentation_rng(seed, index, copy)
+                augmented_data.append((random_augmentation(img, rng), label))
     
     return images_with_labels + augmented_data
-
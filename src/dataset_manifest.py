@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from collections import Counter
+import cv2
+import numpy as np
+from src.data_utils import calculate_image_hash, assess_image_quality, deduplicate_hashes
+from src.image_upload import decode_image
+from src.parallel import map_chunks
+
+VALID_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.avif')
+
+
+def read_image(path, target_size):
+    # Mesma decodificação da inferência (ver src/image_upload.py).
+    return decode_image(np.fromfile(path, dtype=np.uint8), target_size)
+
+
+class DatasetManifest:
+    VERSION = 2
+
+    def __init__(self, manifest_path='models/dataset_manifest.json'):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self.stats = Counter()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.VERSION:
+                self.entries = manifest['entries']
+        except (OSError, ValueError, KeyError):
+            self.entries = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def scan(self, base_path, class_mapping, workers=None):
+        # Compara tamanho/mtime de cada arquivo com o manifesto e só lê ou
+        # decodifica o que é novo ou mudou. Retorna as entradas em ordem estável.
+        self.stats = Counter()
+        scanned = {}
+        pending = []
+        for folder_name, class_name in class_mapping.items():
+            folder_path = os.path.join(base_path, folder_name)
+            if not os.path.isdir(folder_path):
+                continue
+            with os.scandir(folder_path) as it:
+                files = sorted((e for e in it if e.is_file() and e.name.lower().endswith(VALID_EXTENSIONS)),
+                               key=lambda e: e.name)
+            for dir_entry in files:
+                path = os.path.join(folder_path, dir_entry.name).replace(os.sep, '/')
+                stat = dir_entry.stat()
+                previous = self.entries.get(path)
+                entry = {'path': path, 'class': class_name,
+                         'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                if (previous is not None and previous['size'] == stat.st_size
+                        and previous['mtime_ns'] == stat.st_mtime_ns):
+                    self.stats['unchanged'] += 1
+                    scanned[path] = dict(previous, **entry)
+                else:
+                    scanned[path] = entry
+                    pending.append((path, previous['sha256'] if previous else None))
+
+        descriptions = map_chunks(describe_image_files, pending, workers=workers)
+        for (path, known_digest), description in zip(pending, (d for chunk in descriptions for d in chunk)):
+            previous = self.entries.get(path)
+            if description is None:
+                self.stats['unreadable'] += 1
+                del scanned[path]
+            elif description['sha256'] == known_digest:
+                self.stats['touched'] += 1
+                scanned[path] = dict(previous, **scanned[path])
+            else:
+                self.stats['changed' if previous is not None else 'new'] += 1
+                scanned[path].update(description)
+
+        self.stats['removed'] = len(set(self.entries) - set(scanned))
+        self.entries = scanned
+        self.save()
+        return list(scanned.values())
+
+
+def describe_image_files(items):
+    # items: (caminho, sha256 conhecido). Só decodifica quando o conteúdo mudou.
+    descriptions = []
+    for path, known_digest in items:
+        try:
+            data = np.fromfile(path, dtype=np.uint8)
+        except OSError:
+            descriptions.append(None)
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == known_digest:
+            descriptions.append({'sha256': digest})
+            continue
+        image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+        if image is None:
+            descriptions.append(None)
+            continue
+        descriptions.append({
+            'sha256': digest,
+            'phash': calculate_image_hash(image),
+            'quality': assess_image_quality(image)
+        })
+    return descriptions
+
+
+def deduplicate_entries(entries, max_distance=6):
+    kept, duplicates = deduplicate_hashes((entry['phash'] for entry in entries), max_distance)
+    return [entries[idx] for idx in kept], duplicates
+
+
+def filter_entries_by_quality(entries, min_quality=0.3):
+    filtered = [entry for entry in entries if entry['quality'] >= min_quality]
+    removed = [(idx, entry['quality']) for idx, entry in enumerate(entries)
+               if entry['quality'] < min_quality]
+    return filtered, removed
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import numpy as np
+from src.feedback_collector import file_lock
+
+
+class FeatureCache:
+    # Features visuais indexadas pelo SHA-256 dos bytes do arquivo. Cada
+    # configuração do extrator tem seu próprio diretório com uma matriz float32
+    # crua (features.f32) e as chaves na mesma ordem (keys.txt), ambos só
+    # crescem: as linhas são gravadas antes das chaves, então uma execução
+    # interrompida deixa no máximo linhas órfãs, descartadas no próximo add.
+    # Leitura do índice e gravação ficam sob uma trava de arquivo: treinos
+    # simultâneos (agendador e manual) não intercalam linhas e chaves.
+    def __init__(self, extractor, cache_dir='models/feature_cache'):
+        self.extractor = extractor
+        self.size = extractor.visual_size
+        config = extractor.config()
+        namespace = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+        self.directory = os.path.join(cache_dir, namespace)
+        self.data_path = os.path.join(self.directory, 'features.f32')
+        self.keys_path = os.path.join(self.directory, 'keys.txt')
+        self.config_path = os.path.join(self.directory, 'config.json')
+        self.lock_path = os.path.join(self.directory, 'cache.lock')
+        self.config = config
+        self.hits = 0
+        self.misses = 0
+        if os.path.isdir(self.directory):
+            with file_lock(self.lock_path):
+                self._load_index()
+        else:
+            self._load_index()
+
+    def _load_index(self):
+        # Chamar com a trava adquirida (se o diretório existir).
+        self.keys = []
+        self._keys_bytes = 0
+        try:
+            with open(self.config_path, 'r') as f:
+                stored = json.load(f)
+            if stored.get('config') == self.config and stored.get('size') == self.size:
+                stored_rows = os.path.getsize(self.data_path) // (self.size * 4)
+                with open(self.keys_path, 'rb') as f:
+                    for line in f:
+                        if len(self.keys) == stored_rows or not line.endswith(b'\n'):
+                            break
+                        self.keys.append(line[:-1].decode('ascii'))
+                        self._keys_bytes += len(line)
+        except (OSError, ValueError):
+            self.keys = []
+            self._keys_bytes = 0
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self._features = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def _matrix(self):
+        if self._features is None and self.keys:
+            self._features = np.memmap(self.data_path, dtype=np.float32, mode='r',
+                                       shape=(len(self.keys), self.size))
+        return self._features
+
+    def lookup(self, keys):
+        keys = list(keys)
+        features = np.zeros((len(keys), self.size), dtype=np.float32)
+        found = np.array([key in self.rows for key in keys], dtype=bool)
+        if found.any():
+            rows = [self.rows[key] for key, hit in zip(keys, found) if hit]
+            features[found] = self._matrix()[rows]
+        return features, found
+
+    def add(self, keys, features):
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.size)
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.lock_path):
+            # Relê o índice: outro processo pode ter gravado desde a última leitura.
+            self._load_index()
+            return self._add(keys, features)
+
+    def _add(self, keys, features):
+        new_keys = []
+        new_rows = []
+        for key, row in zip(keys, features):
+            if key is not None and key not in self.rows:
+                self.rows[key] = len(self.keys) + len(new_keys)
+                new_keys.append(key)
+                new_rows.append(row)
+        if not new_keys:
+            return 0
+
+        if not self.keys:
+            with open(self.config_path, 'w') as f:
+                json.dump({'config': self.config, 'size': self.size}, f)
+            open(self.keys_path, 'wb').close()
+        self._features = None
+        with open(self.data_path, 'ab') as f:
+            f.truncate(len(self.keys) * self.size * 4)
+            f.write(np.ascontiguousarray(new_rows, dtype=np.float32).tobytes())
+        content = ''.join(key + '\n' for key in new_keys).encode('ascii')
+        with open(self.keys_path, 'ab') as f:
+            f.truncate(self._keys_bytes)
+            f.write(content)
+        self._keys_bytes += len(content)
+        self.keys.extend(new_keys)
+        return len(new_keys)
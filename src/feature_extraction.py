@@ -1,11 +1,11 @@
+import importlib.util
 import cv2
 import numpy as np
-try:
-    from skimage.feature import local_binary_pattern, graycomatrix, graycoprops
-    from skimage import img_as_ubyte
-    _SKIMAGE_AVAILABLE = True
-except Exception:
-    _SKIMAGE_AVAILABLE = False
+from src.feature_plan import FeatureGroup, FeaturePlan
+from src.texture import uniform_lbp, glcm_properties
+from src.keyword_matcher import KeywordMatcher
+
+_SKIMAGE_AVAILABLE = importlib.util.find_spec('skimage') is not None
 
 
 class FeatureExtractor:
@@ -39,109 +39,138 @@ class FeatureExtractor:
         ]
     }
     
-    def __init__(self):
+    TEXT_MATCHER = KeywordMatcher(KEYWORDS)
+    # 2: imagens decodificadas por src.image_upload.decode_image (JPEG reduzido).
+    FEATURE_VERSION = 2
+    
+    VISUAL_GROUPS = ('hsv_histogram', 'hsv_stats', 'lbp', 'glcm', 'canny', 'hu_moments')
+    TEXTURE_BACKENDS = ('native', 'skimage')
+    
+    def __init__(self, groups=None, texture_backend='native'):
         self.lbp_radius = 3
         self.lbp_n_points = 24
         
+        if texture_backend not in self.TEXTURE_BACKENDS:
+            raise ValueError(f"Backend de textura desconhecido: {texture_backend}")
+        if texture_backend == 'skimage' and not _SKIMAGE_AVAILABLE:
+            raise ImportError("scikit-image não está instalado; use texture_backend='native'")
+        self.texture_backend = texture_backend
+        
+        available = {
+            'hsv_histogram': FeatureGroup('hsv_histogram', 90, ['hsv'], self._batch_hsv_histogram),
+            'hsv_stats': FeatureGroup('hsv_stats', 6, ['hsv'], self._batch_hsv_stats),
+            'lbp': FeatureGroup('lbp', 10, ['gray'], self._batch_lbp),
+            'glcm': FeatureGroup('glcm', 4, ['gray'], self._batch_glcm),
+            'canny': FeatureGroup('canny', 1, ['edges'], self._batch_canny),
+            'hu_moments': FeatureGroup('hu_moments', 7, ['gray'], self._batch_hu_moments)
+        }
+        if groups is None:
+            groups = self.VISUAL_GROUPS
+        unknown = set(groups) - set(available)
+        if unknown:
+            raise ValueError(f"Grupos de features desconhecidos: {sorted(unknown)}")
+        
+        self.plan = FeaturePlan([available[name] for name in self.VISUAL_GROUPS if name in groups])
+        self.visual_size = self.plan.size
+        self.text_size = len(self.KEYWORDS)
+        self.feature_size = self.visual_size + self.text_size
+    
+    def config(self):
+        # Identifica a saída visual; os dois backends de textura são idênticos.
+        return {
+            'version': self.FEATURE_VERSION,
+            'groups': [group.name for group in self.plan.groups],
+            'image_size': list(self.plan.image_size),
+            'lbp': [self.lbp_n_points, self.lbp_radius]
+        }
+    
+    def feature_layout(self):
+        layout = dict(self.plan.layout)
+        layout['text'] = (self.visual_size, self.feature_size)
+        return layout
+    
     def extract_visual_features(self, image):
         if image is None or image.size == 0:
             raise ValueError("Imagem inválida ou vazia")
-        
-        image_resized = cv2.resize(image, (256, 256))
-        hsv = cv2.cvtColor(image_resized, cv2.COLOR_BGR2HSV)
-        
-        hist_features = self._extract_hsv_histogram(hsv)
-        stats_features = self._extract_hsv_stats(hsv)
-        lbp_features = self._extract_lbp(image_resized)
-        glcm_features = self._extract_glcm(image_resized)
-        canny_features = self._extract_canny(image_resized)
-        hu_features = self._extract_hu_moments(image_resized)
-        
-        all_features = np.concatenate([
-            hist_features,
-            stats_features,
-            lbp_features,
-            glcm_features,
-            canny_features,
-            hu_features
-        ])
-        
-        return all_features
+        return self.plan.run([image])[0]
     
-    def _extract_hsv_histogram(self, hsv):
-        hist_h = cv2.calcHist([hsv], [0], None, [30], [0, 180])
-        hist_s = cv2.calcHist([hsv], [1], None, [30], [0, 256])
-        hist_v = cv2.calcHist([hsv], [2], None, [30], [0, 256])
-        
-        hist_h = hist_h.flatten() / hist_h.sum()
-        hist_s = hist_s.flatten() / hist_s.sum()
-        hist_v = hist_v.flatten() / hist_v.sum()
-        
-        return np.concatenate([hist_h, hist_s, hist_v])
-    
-    def _extract_hsv_stats(self, hsv):
-        stats = []
-        for i in range(3):
-            channel = hsv[:, :, i]
-            stats.append(np.mean(channel))
-            stats.append(np.std(channel))
-        return np.array(stats)
-    
-    def _extract_lbp(self, image):
-        if not _SKIMAGE_AVAILABLE:
-            return np.zeros(10)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        lbp = local_binary_pattern(gray, self.lbp_n_points, self.lbp_radius, method='uniform')
+    def extract_visual_features_batch(self, images):
+        return self.plan.run(images)
+    
+    @staticmethod
+    def _hist_lut(bins, upper):
+        # Mesmo mapeamento valor -> bin usado por cv2.calcHist em imagens uint8;
+        # valores fora do intervalo vão para o bin extra `bins`.
+        values = np.arange(256)
+        lut = np.minimum(np.floor(values * (bins / float(upper))), bins - 1).astype(np.intp)
+        lut[values >= upper] = bins
+        return lut
+    
+    @staticmethod
+    def _batch_bincount(indices, n_bins):
+        n = indices.shape[0]
+        offsets = (np.arange(n, dtype=np.intp) * (n_bins + 1))[:, None]
+        counts = np.bincount((indices.reshape(n, -1) + offsets).ravel(),
+                             minlength=n * (n_bins + 1))
+        return counts.reshape(n, n_bins + 1)[:, :n_bins]
+    
+    def _batch_hsv_histogram(self, hsv):
+        hists = []
+        for channel, upper in enumerate((180, 256, 256)):
+            bins = self._hist_lut(30, upper)[hsv[..., channel]]
+            counts = self._batch_bincount(bins, 30).astype(np.float32)
+            hists.append(counts / counts.sum(axis=1, keepdims=True))
+        return np.hstack(hists)
+    
+    def _batch_hsv_stats(self, hsv):
+        channels = np.ascontiguousarray(np.moveaxis(hsv, -1, 1))
+        means = channels.mean(axis=(2, 3))
+        stds = channels.std(axis=(2, 3))
+        return np.stack([means, stds], axis=2).reshape(len(hsv), 6)
+    
+    def _batch_lbp(self, gray):
         n_bins = 10
-        hist, _ = np.histogram(lbp.ravel(), bins=n_bins, range=(0, n_bins), density=True)
-        return hist
-    
-    def _extract_glcm(self, image):
-        if not _SKIMAGE_AVAILABLE:
-            return np.zeros(4)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        gray = img_as_ubyte(gray // 32)
-        
-        distances = [1]
-        angles = [0]
-        glcm = graycomatrix(gray, distances=distances, angles=angles, 
-                           levels=8, symmetric=True, normed=True)
-        
-        contrast = graycoprops(glcm, 'contrast')[0, 0]
-        dissimilarity = graycoprops(glcm, 'dissimilarity')[0, 0]
-        homogeneity = graycoprops(glcm, 'homogeneity')[0, 0]
-        energy = graycoprops(glcm, 'energy')[0, 0]
-        
-        return np.array([contrast, dissimilarity, homogeneity, energy])
-    
-    def _extract_canny(self, image):
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        edges = cv2.Canny(gray, 100, 200)
-        edge_density = np.sum(edges > 0) / edges.size
-        return np.array([edge_density])
-    
-    def _extract_hu_moments(self, image):
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        moments = cv2.moments(gray)
-        hu_moments = cv2.HuMoments(moments).flatten()
-        hu_moments = -np.sign(hu_moments) * np.log10(np.abs(hu_moments) + 1e-10)
-        
-        return hu_moments
+        if self.texture_backend == 'skimage':
+            from skimage.feature import local_binary_pattern
+            codes = np.stack([
+                local_binary_pattern(g, self.lbp_n_points, self.lbp_radius, method='uniform')
+                for g in gray
+            ])
+        else:
+            codes = uniform_lbp(gray, self.lbp_n_points, self.lbp_radius)
+        codes = codes.astype(np.intp)
+        # np.histogram com range=(0, 10) inclui a borda direita no último bin
+        bins = np.where(codes <= n_bins, np.minimum(codes, n_bins - 1), n_bins)
+        counts = self._batch_bincount(bins, n_bins)
+        return counts / np.ones(n_bins) / counts.sum(axis=1, keepdims=True)
+    
+    def _batch_glcm(self, gray):
+        if self.texture_backend == 'native':
+            return glcm_properties(gray, levels=8)
+        from skimage.feature import graycomatrix, graycoprops
+        features = np.empty((len(gray), 4))
+        for i, g in enumerate(gray):
+            glcm = graycomatrix(g // 32, distances=[1], angles=[0],
+                               levels=8, symmetric=True, normed=True)
+            features[i] = [graycoprops(glcm, prop)[0, 0]
+                           for prop in ('contrast', 'dissimilarity', 'homogeneity', 'energy')]
+        return features
+    
+    def _batch_canny(self, edges):
+        edge_pixels = np.count_nonzero(edges.reshape(len(edges), -1), axis=1)
+        return (edge_pixels / edges[0].size).reshape(-1, 1)
+    
+    def _batch_hu_moments(self, gray):
+        hu_moments = np.array([cv2.HuMoments(cv2.moments(g)).flatten() for g in gray])
+        return -np.sign(hu_moments) * np.log10(np.abs(hu_moments) + 1e-10)
     
     def extract_text_features(self, text):
-        text_lower = text.lower()
-        scores = []
-        
-        for class_name in ['Orgânico', 'Reciclável', 'Rejeito', 'Perigoso']:
-            keywords = self.KEYWORDS[class_name]
-            score = sum(1 for keyword in keywords if keyword.lower() in text_lower)
-            scores.append(score)
-        
-        total = sum(scores)
-        if total > 0:
-            scores = [s / total for s in scores]
-        
-        return np.array(scores)
+        return self.extract_text_features_batch([text])[0]
+    
+    def extract_text_features_batch(self, texts):
+        scores = self.TEXT_MATCHER.count_batch(texts)
+        totals = scores.sum(axis=1, keepdims=True)
+        return np.divide(scores, totals, out=np.zeros(scores.shape), where=totals > 0)
     
     def extract_combined_features(self, image=None, text=""):
         features = []
@@ -150,7 +179,7 @@ class FeatureExtractor:
             visual_features = self.extract_visual_features(image)
             features.append(visual_features)
         else:
-            features.append(np.zeros(118))
+            features.append(np.zeros(self.visual_size))
         
         text_features = self.extract_text_features(text)
         features.append(text_features)
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+
+def _stack_rows(batch):
+    n, height, width = batch.shape[:3]
+    return batch.reshape(n * height, width, *batch.shape[3:])
+
+
+def _compute_hsv(resized):
+    return cv2.cvtColor(_stack_rows(resized), cv2.COLOR_BGR2HSV).reshape(resized.shape)
+
+
+def _compute_gray(resized):
+    return cv2.cvtColor(_stack_rows(resized), cv2.COLOR_BGR2GRAY).reshape(resized.shape[:3])
+
+
+def _compute_edges(gray):
+    return np.stack([cv2.Canny(g, 100, 200) for g in gray])
+
+
+# nome -> (intermediário de origem, função aplicada ao lote inteiro)
+INTERMEDIATES = {
+    'hsv': ('resized', _compute_hsv),
+    'gray': ('resized', _compute_gray),
+    'edges': ('gray', _compute_edges),
+}
+
+
+class FeatureGroup:
+    def __init__(self, name, size, requires, compute):
+        self.name = name
+        self.size = size
+        self.requires = tuple(requires)
+        self.compute = compute
+
+
+class FeaturePlan:
+    def __init__(self, groups, image_size=(256, 256)):
+        self.groups = list(groups)
+        self.image_size = image_size
+
+        names = [group.name for group in self.groups]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Grupos de features duplicados: {names}")
+
+        self.layout = {}
+        offset = 0
+        for group in self.groups:
+            self.layout[group.name] = (offset, offset + group.size)
+            offset += group.size
+        self.size = offset
+
+        self.intermediates = []
+        for group in self.groups:
+            for name in group.requires:
+                self._require(name)
+
+    def _require(self, name):
+        if name == 'resized' or name in self.intermediates:
+            return
+        if name not in INTERMEDIATES:
+            raise ValueError(f"Intermediário desconhecido: {name}")
+        self._require(INTERMEDIATES[name][0])
+        self.intermediates.append(name)
+
+    def resize(self, images):
+        width, height = self.image_size
+        batch = np.empty((len(images), height, width, 3), dtype=np.uint8)
+        for i, image in enumerate(images):
+            if image is None or image.size == 0:
+                raise ValueError(f"Imagem inválida ou vazia (posição {i})")
+            batch[i] = cv2.resize(image, (width, height))
+        return batch
+
+    def run(self, images):
+        images = list(images)
+        if len(images) == 0:
+            return np.zeros((0, self.size))
+
+        if not self.groups:
+            return np.zeros((len(images), 0))
+
+        values = {'resized': self.resize(images)}
+        for name in self.intermediates:
+            source, compute = INTERMEDIATES[name]
+            values[name] = compute(values[source])
+
+        return np.hstack([
+            group.compute(*[values[name] for name in group.requires])
+            for group in self.groups
+        ])
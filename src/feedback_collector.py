@@ -1,47 +1,164 @@
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
+from src.feature_extraction import FeatureExtractor
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(lock_path):
+    # Trava exclusiva entre processos: fcntl no Linux/macOS, msvcrt no Windows.
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK desiste após ~10s; continua esperando.
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
 
 class FeedbackCollector:
-    def __init__(self, feedback_file='models/feedback_data.json'):
+    # Log só de acréscimo: uma linha JSON por feedback. Cada gravação acrescenta
+    # uma linha sob uma trava de arquivo, sem reler o log. A contagem fica num
+    # índice ao lado (<log>.idx) junto com o tamanho do log em bytes; se os
+    # tamanhos não baterem (ex.: gravação interrompida), a contagem é refeita.
+    def __init__(self, feedback_file='models/feedback_data.jsonl', legacy_file='models/feedback_data.json'):
         self.feedback_file = feedback_file
+        self.legacy_file = legacy_file
+        self.index_file = feedback_file + '.idx'
+        self.lock_file = feedback_file + '.lock'
         self.ensure_feedback_file()
-    
+
     def ensure_feedback_file(self):
-        os.makedirs(os.path.dirname(self.feedback_file), exist_ok=True)
-        if not os.path.exists(self.feedback_file):
-            with open(self.feedback_file, 'w') as f:
-                json.dump([], f)
-    
-    def save_feedback(self, features, predicted_class, user_correction, text=""):
-        feedback_entry = {
+        os.makedirs(os.path.dirname(self.feedback_file) or '.', exist_ok=True)
+        with file_lock(self.lock_file):
+            if not os.path.exists(self.feedback_file):
+                self._migrate_legacy()
+
+    def _migrate_legacy(self):
+        # Converte o antigo feedback_data.json (lista JSON) uma única vez.
+        entries = []
+        if self.legacy_file and os.path.exists(self.legacy_file):
+            try:
+                with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = []
+
+        temp_path = self.feedback_file + '.tmp'
+        with open(temp_path, 'wb') as f:
+            for entry in entries:
+                f.write(self._encode(entry))
+        os.replace(temp_path, self.feedback_file)
+        self._write_index(len(entries))
+
+        if entries:
+            os.replace(self.legacy_file, self.legacy_file + '.migrated')
+            print(f"Feedback migrado: {len(entries)} registros de {self.legacy_file}")
+
+    def _encode(self, entry):
+        return (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+
+    def _read_index(self):
+        try:
+            with open(self.index_file, 'r') as f:
+                index = json.load(f)
+            return int(index['count']), int(index['bytes'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_index(self, count):
+        temp_path = self.index_file + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'count': count, 'bytes': os.path.getsize(self.feedback_file)}, f)
+        os.replace(temp_path, self.index_file)
+
+    def _count_lines(self):
+        count = 0
+        with open(self.feedback_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                count += block.count(b'\n')
+        return count
+
+    def _current_count(self):
+        # Chamar com a trava adquirida.
+        index = self._read_index()
+        if index is not None and index[1] == os.path.getsize(self.feedback_file):
+            return index[0]
+        count = self._count_lines()
+        self._write_index(count)
+        return count
+
+    def make_entry(self, features, predicted_class, user_correction, text=""):
+        return {
             'timestamp': datetime.now().isoformat(),
             'predicted': predicted_class,
             'correct': user_correction,
             'text': text,
+            'feature_version': FeatureExtractor.FEATURE_VERSION,
             'features': features.tolist() if hasattr(features, 'tolist') else list(features)
         }
-        
-        try:
-            with open(self.feedback_file, 'r') as f:
-                feedbacks = json.load(f)
-        except:
-            feedbacks = []
-        
-        feedbacks.append(feedback_entry)
-        
-        with open(self.feedback_file, 'w') as f:
-            json.dump(feedbacks, f, indent=2)
-        
-        return len(feedbacks)
-    
+
+    def save_feedback(self, features, predicted_class, user_correction, text=""):
+        return self.save_feedback_batch([self.make_entry(features, predicted_class, user_correction, text)])
+
+    def save_feedback_batch(self, entries, fsync=False):
+        # Acrescenta todos os registros numa única gravação sob a trava e
+        # devolve o total de feedbacks. fsync=True força a ida ao disco.
+        records = b''.join(self._encode(entry) for entry in entries)
+
+        with file_lock(self.lock_file):
+            count = self._current_count()
+            with open(self.feedback_file, 'r+b') as f:
+                f.seek(0, os.SEEK_END)
+                # Uma gravação interrompida pode ter deixado a última linha
+                # sem '\n'; ela é isolada para não corromper os novos registros.
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        records = b'\n' + records
+                f.write(records)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            count += len(entries)
+            self._write_index(count)
+
+        return count
+
     def load_feedback(self):
+        feedbacks = []
         try:
-            with open(self.feedback_file, 'r') as f:
-                return json.load(f)
-        except:
+            with open(self.feedback_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        feedbacks.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
             return []
-    
-    def get_feedback_count(self):
-        return len(self.load_feedback())
+        return feedbacks
 
+    def get_feedback_count(self):
+        with file_lock(self.lock_file):
+            return self._current_count()
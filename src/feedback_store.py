@@ -0,0 +1,217 @@
+import json
+import os
+from datetime import datetime
+import numpy as np
+from src.feedback_collector import file_lock
+from src.feature_extraction import FeatureExtractor
+
+
+# Versão colunar do log de feedback para o re-treino. compact() lê o log a
+# partir do último offset processado e acrescenta cada campo em seu próprio
+# arquivo cru: features float32 (N x F), códigos de rótulo uint8, timestamps
+# float64 e índices de texto int32 para uma lista de textos sem repetição.
+# state.json é gravado por último; colunas maiores do que o estado indica
+# (execução interrompida) são truncadas na compactação seguinte. Feedback com
+# imagem só entra se tiver a versão atual das features
+# (FeatureExtractor.FEATURE_VERSION); os só de texto (parte visual zerada) não
+# dependem dela e entram sempre. Quando a versão muda, a compactação recomeça
+# do zero e informa quantos registros ficaram de fora.
+
+
+class FeedbackData:
+    def __init__(self, features, correct, predicted, timestamps, text_ids, labels, texts):
+        self.features = features
+        self.correct_codes = correct
+        self.predicted_codes = predicted
+        self.timestamps = timestamps
+        self.text_ids = text_ids
+        self.labels = labels
+        self.texts = texts
+
+    def __len__(self):
+        return len(self.correct_codes)
+
+    @property
+    def correct(self):
+        return np.array(self.labels, dtype=str)[self.correct_codes] if self.labels else np.array([], dtype=str)
+
+    @property
+    def predicted(self):
+        return np.array(self.labels, dtype=str)[self.predicted_codes] if self.labels else np.array([], dtype=str)
+
+    def text(self, i):
+        return self.texts[self.text_ids[i]]
+
+
+class FeedbackStore:
+    VERSION = 1
+    COLUMNS = {
+        'correct': np.uint8,
+        'predicted': np.uint8,
+        'timestamps': np.float64,
+        'text_ids': np.int32,
+    }
+
+    def __init__(self, feedback_file='models/feedback_data.jsonl', store_dir='models/feedback_compact',
+                 chunk_bytes=16 << 20):
+        self.feedback_file = feedback_file
+        self.store_dir = store_dir
+        self.chunk_bytes = chunk_bytes
+        self.state_path = os.path.join(store_dir, 'state.json')
+        self.texts_path = os.path.join(store_dir, 'texts.jsonl')
+        self.features_path = os.path.join(store_dir, 'features.f32')
+        self.lock_file = os.path.join(store_dir, 'compact.lock')
+
+    def _column_path(self, name):
+        return os.path.join(self.store_dir, f'{name}.bin')
+
+    def read_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') == self.VERSION and state.get('feature_version') == FeatureExtractor.FEATURE_VERSION:
+                return state
+        except (OSError, ValueError):
+            pass
+        return self._empty_state()
+
+    def _empty_state(self):
+        return {'version': self.VERSION, 'feature_version': FeatureExtractor.FEATURE_VERSION, 'offset': 0, 'count': 0, 'n_features': None,
+                'labels': [], 'n_texts': 0, 'texts_bytes': 0, 'skipped': 0, 'outdated': 0}
+
+    def _write_state(self, state):
+        temp_path = self.state_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def _read_texts(self, state):
+        texts = []
+        if state['n_texts']:
+            with open(self.texts_path, 'rb') as f:
+                for line in f.read(state['texts_bytes']).splitlines():
+                    texts.append(json.loads(line))
+        return texts
+
+    def _append(self, path, data, keep_bytes):
+        with open(path, 'ab') as f:
+            f.truncate(keep_bytes)
+            f.write(data)
+
+    def compact(self):
+        # Processa o que foi acrescentado ao log desde a última execução e
+        # devolve o número de registros novos.
+        os.makedirs(self.store_dir, exist_ok=True)
+        with file_lock(self.lock_file):
+            state = self.read_state()
+            if os.path.exists(self.feedback_file) and os.path.getsize(self.feedback_file) < state['offset']:
+                # O log foi recriado menor do que o já processado.
+                state = self._empty_state()
+            if state['offset'] == 0 and state['count'] == 0:
+                # Estado novo (ou de outra versão): recomeça do zero.
+                for path in [self.features_path, self.texts_path] + [self._column_path(n) for n in self.COLUMNS]:
+                    if os.path.exists(path):
+                        os.remove(path)
+            if not os.path.exists(self.feedback_file) or os.path.getsize(self.feedback_file) <= state['offset']:
+                return 0
+
+            outdated_before = state.get('outdated', 0)
+            texts = self._read_texts(state)
+            text_index = {text: i for i, text in enumerate(texts)}
+            label_index = {label: i for i, label in enumerate(state['labels'])}
+            added = 0
+
+            with open(self.feedback_file, 'rb') as log:
+                log.seek(state['offset'])
+                pending = b''
+                while True:
+                    block = log.read(self.chunk_bytes)
+                    if not block:
+                        break
+                    block = pending + block
+                    end = block.rfind(b'\n') + 1
+                    # Só linhas completas; o resto fica para o próximo bloco
+                    # (ou para a próxima compactação, se a gravação está em curso).
+                    lines, pending = block[:end], block[end:]
+                    if lines:
+                        added += self._compact_lines(lines.splitlines(), state, text_index, label_index, texts)
+                        state['offset'] += len(lines)
+                        self._write_state(state)
+            outdated = state.get('outdated', 0) - outdated_before
+            if outdated:
+                print(f"⚠️ {outdated} feedbacks com imagem ignorados: features de versão anterior à atual "
+                      f"({FeatureExtractor.FEATURE_VERSION}). Os só de texto foram mantidos.")
+            return added
+
+    def _compact_lines(self, lines, state, text_index, label_index, texts):
+        features, correct, predicted, timestamps, text_ids = [], [], [], [], []
+        new_texts = []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                row = np.asarray(entry['features'], dtype=np.float32)
+                timestamp = datetime.fromisoformat(entry['timestamp']).timestamp()
+            except (ValueError, KeyError, TypeError):
+                state['skipped'] += 1
+                continue
+            if state['n_features'] is None:
+                state['n_features'] = len(row)
+            if len(row) != state['n_features']:
+                # Feedback gravado com outra versão do extrator.
+                state['skipped'] += 1
+                continue
+            text_only = not row[:-len(FeatureExtractor.KEYWORDS)].any()
+            if not text_only and entry.get('feature_version', 1) != FeatureExtractor.FEATURE_VERSION:
+                # Features visuais de outra decodificação/extração.
+                state['outdated'] = state.get('outdated', 0) + 1
+                continue
+
+            for label in (entry.get('correct'), entry.get('predicted')):
+                if label not in label_index:
+                    label_index[label] = len(state['labels'])
+                    state['labels'].append(label)
+            text = entry.get('text') or ""
+            if text not in text_index:
+                text_index[text] = len(texts)
+                texts.append(text)
+                new_texts.append(text)
+
+            features.append(row)
+            correct.append(label_index[entry.get('correct')])
+            predicted.append(label_index[entry.get('predicted')])
+            timestamps.append(timestamp)
+            text_ids.append(text_index[text])
+
+        if not features:
+            return 0
+        count = state['count']
+        columns = {'correct': correct, 'predicted': predicted, 'timestamps': timestamps, 'text_ids': text_ids}
+        # Colunas primeiro, estado por último (ver comentário do módulo).
+        self._append(self.features_path, np.asarray(features, dtype=np.float32).tobytes(),
+                     count * state['n_features'] * 4)
+        for name, dtype in self.COLUMNS.items():
+            self._append(self._column_path(name), np.asarray(columns[name], dtype=dtype).tobytes(),
+                         count * np.dtype(dtype).itemsize)
+        if new_texts:
+            content = ''.join(json.dumps(text, ensure_ascii=False) + '\n' for text in new_texts).encode('utf-8')
+            self._append(self.texts_path, content, state['texts_bytes'])
+            state['texts_bytes'] += len(content)
+            state['n_texts'] = len(texts)
+        state['count'] = count + len(features)
+        return len(features)
+
+    def load(self):
+        # Arrays mapeados em memória (somente leitura) com os registros já
+        # compactados. Chame compact() antes para incluir os mais recentes.
+        state = self.read_state()
+        count = state['count']
+        if count == 0:
+            empty = np.zeros(0)
+            return FeedbackData(np.zeros((0, state['n_features'] or 0), dtype=np.float32),
+                                empty.astype(np.uint8), empty.astype(np.uint8), empty,
+                                empty.astype(np.int32), [], [])
+        features = np.memmap(self.features_path, dtype=np.float32, mode='r', shape=(count, state['n_features']))
+        columns = {name: np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(count,))
+                   for name, dtype in self.COLUMNS.items()}
+        return FeedbackData(features, columns['correct'], columns['predicted'], columns['timestamps'],
+                            columns['text_ids'], state['labels'], self._read_texts(state))
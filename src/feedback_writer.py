@@ -0,0 +1,120 @@
+import atexit
+import queue
+import threading
+import time
+
+
+# Fila limitada em memória com uma thread gravadora: submit() só enfileira o
+# registro e volta; a thread agrupa o que chegar em até flush_interval
+# segundos (ou batch_size registros) e grava tudo de uma vez, com um único
+# fsync por lote. Com a fila cheia o registro é descartado e contado.
+
+_STOP = object()
+
+
+class FeedbackWriter:
+    def __init__(self, collector, max_pending=10000, flush_interval=1.0, batch_size=256, fsync=True):
+        self.collector = collector
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._done = threading.Condition()
+        self._thread = None
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def submit(self, features, predicted_class, user_correction, text=""):
+        # Devolve True se o registro foi enfileirado, False se foi descartado.
+        entry = self.collector.make_entry(features, predicted_class, user_correction, text)
+        if self._thread is None:
+            self.collector.save_feedback_batch([entry], fsync=self.fsync)
+            with self._done:
+                self.queued += 1
+                self.flushed += 1
+            return True
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._done:
+                self.dropped += 1
+            return False
+        with self._done:
+            self.queued += 1
+        return True
+
+    def _next_batch(self):
+        # Bloqueia até o primeiro registro e junta os que chegarem até o prazo.
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if stopping:
+                # Esvazia o que ainda estiver na fila antes de encerrar.
+                while True:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is not _STOP:
+                        batch.append(entry)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        try:
+            self.collector.save_feedback_batch(batch, fsync=self.fsync)
+            written, failed = len(batch), 0
+        except Exception as e:
+            print(f"Erro ao gravar feedback: {e}")
+            written, failed = 0, len(batch)
+        with self._done:
+            self.flushed += written
+            self.failed += failed
+            self.batches += 1
+            self._done.notify_all()
+
+    def flush(self, timeout=None):
+        # Espera até tudo que foi enfileirado ser gravado (ou falhar).
+        with self._done:
+            return self._done.wait_for(lambda: self.flushed + self.failed >= self.queued, timeout)
+
+    def close(self, timeout=10.0):
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._done:
+            return {'queued': self.queued, 'flushed': self.flushed, 'dropped': self.dropped,
+                    'failed': self.failed, 'batches': self.batches, 'pending': self._queue.qsize()}
@@ -0,0 +1,129 @@
+import os
+import struct
+import cv2
+import numpy as np
+
+
+# Decodificação de imagens enviadas pelo usuário. O cabeçalho é lido antes de
+# decodificar qualquer pixel: arquivos acima de max_bytes ou com mais de
+# max_pixels são recusados, e o JPEG é decodificado já reduzido (1/2, 1/4 ou
+# 1/8, direto na DCT pelo libjpeg) no maior fator que ainda cobre o tamanho
+# de trabalho do extrator. Uma foto de 12 MP vira ~500 x 375 sem nunca existir
+# inteira na memória. Para exibição há uma miniatura separada.
+#
+# decode_image é a mesma decodificação usada no treino (src/pipeline.py), no
+# cache de features e no feedback: o modelo vê exatamente as features com que
+# foi treinado. Mudar a decodificação exige subir FeatureExtractor.FEATURE_VERSION.
+
+MAX_UPLOAD_BYTES = 20 << 20
+MAX_UPLOAD_PIXELS = 50_000_000
+PREVIEW_SIZE = 512
+
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                  (2, cv2.IMREAD_REDUCED_COLOR_2))
+# Marcadores SOF (início de quadro) do JPEG; C4, C8 e CC são outros segmentos.
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def upload_limits():
+    # (bytes, pixels); GREENTRASH_MAX_UPLOAD_MB e GREENTRASH_MAX_UPLOAD_MEGAPIXELS
+    # substituem os padrões.
+    max_mb = os.environ.get('GREENTRASH_MAX_UPLOAD_MB')
+    max_megapixels = os.environ.get('GREENTRASH_MAX_UPLOAD_MEGAPIXELS')
+    return (int(float(max_mb) * (1 << 20)) if max_mb else MAX_UPLOAD_BYTES,
+            int(float(max_megapixels) * 1_000_000) if max_megapixels else MAX_UPLOAD_PIXELS)
+
+
+def image_header(data):
+    # (formato, largura, altura) lidos do cabeçalho, ou None se o formato não
+    # for reconhecido. Não decodifica a imagem.
+    data = memoryview(data)
+    if bytes(data[:8]) == b'\x89PNG\r\n\x1a\n' and bytes(data[12:16]) == b'IHDR' and len(data) >= 24:
+        width, height = struct.unpack('>II', data[16:24])
+        return 'png', width, height
+    if bytes(data[:2]) == b'BM' and len(data) >= 26:
+        width, height = struct.unpack('<ii', data[18:26])
+        return 'bmp', abs(width), abs(height)
+    if bytes(data[:4]) == b'RIFF' and bytes(data[8:12]) == b'WEBP' and len(data) >= 30:
+        chunk = bytes(data[12:16])
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return 'webp', width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return 'webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return 'webp', int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return None
+    if bytes(data[:2]) == b'\xff\xd8':
+        position = 2
+        while position + 9 <= len(data):
+            if data[position] != 0xFF:
+                return None
+            marker = data[position + 1]
+            if marker == 0xFF:
+                # Bytes de preenchimento entre segmentos.
+                position += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                position += 2
+                continue
+            if marker in _JPEG_SOF:
+                height, width = struct.unpack('>HH', data[position + 5:position + 9])
+                return 'jpeg', width, height
+            position += 2 + struct.unpack('>H', data[position + 2:position + 4])[0]
+    return None
+
+
+def reduction_factor(width, height, target_size):
+    # Maior fator (8, 4, 2) que ainda deixa a imagem do tamanho do alvo ou maior.
+    for factor, flag in _REDUCED_FLAGS:
+        if width // factor >= target_size[0] and height // factor >= target_size[1]:
+            return factor, flag
+    return 1, cv2.IMREAD_COLOR
+
+
+def make_preview(image, preview_size=PREVIEW_SIZE):
+    # Miniatura RGB com o maior lado limitado a preview_size.
+    height, width = image.shape[:2]
+    scale = preview_size / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def decode_image(data, target_size=(256, 256)):
+    # Imagem BGR (JPEG já reduzido, demais formatos inteiros) que o extrator
+    # redimensiona para target_size, ou None se os bytes forem ilegíveis.
+    header = image_header(data)
+    flag = cv2.IMREAD_COLOR
+    if header is not None and header[0] == 'jpeg':
+        # Os outros formatos seriam decodificados inteiros mesmo com a flag.
+        _, flag = reduction_factor(header[1], header[2], target_size)
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    return image if image is not None and image.size else None
+
+
+def decode_upload(data, target_size=(256, 256), max_bytes=None, max_pixels=None):
+    # Devolve a imagem BGR pronta para o extrator. Levanta ValueError com uma
+    # mensagem para o usuário quando o arquivo é recusado ou ilegível.
+    default_bytes, default_pixels = upload_limits()
+    max_bytes = default_bytes if max_bytes is None else max_bytes
+    max_pixels = default_pixels if max_pixels is None else max_pixels
+
+    if len(data) > max_bytes:
+        raise ValueError(f"Arquivo muito grande ({len(data) / (1 << 20):.1f} MB; "
+                         f"limite de {max_bytes / (1 << 20):.0f} MB)")
+    header = image_header(data)
+    if header is None:
+        raise ValueError("Formato de imagem não reconhecido. Use JPG, PNG, BMP ou WEBP.")
+    _, width, height = header
+    if width * height > max_pixels:
+        raise ValueError(f"Imagem muito grande ({width} x {height}; "
+                         f"limite de {max_pixels / 1e6:.0f} megapixels)")
+
+    image = decode_image(data, target_size)
+    if image is None:
+        raise ValueError("Erro ao carregar imagem. Tente outro formato.")
+    return image
@@ -0,0 +1,105 @@
+import warnings
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+from src.calibration import CalibratedForest, fit_calibrators
+
+
+# Re-treino incremental: em vez de treinar uma floresta nova com todo o
+# corpus, a floresta atual ganha algumas árvores (warm_start) treinadas só
+# numa janela com os dados novos e uma amostra de reposição do corpus, para
+# que toda classe apareça. Cada árvore guarda a geração em que foi criada e,
+# passando de max_trees, as mais antigas saem. Só a camada de calibração é
+# reajustada, sobre uma parte da janela separada antes do treino. O custo
+# depende do tamanho da janela, não do corpus.
+#
+# Holdout: 1 em HOLDOUT_EVERY imagens (pelo SHA-256) e registros de feedback
+# (pela posição no log) ficam fora de todo treino, completo ou incremental,
+# para que a comparação entre versões use dados que nenhuma delas viu.
+
+HOLDOUT_EVERY = 10
+
+
+def in_holdout(sha256, holdout_every=HOLDOUT_EVERY):
+    # Separação fixa entre execuções: a mesma imagem fica sempre do mesmo lado.
+    return int(sha256[:8], 16) % holdout_every == 0
+
+
+def feedback_holdout(count, holdout_every=HOLDOUT_EVERY):
+    # Máscara dos registros de feedback reservados para o holdout.
+    return np.arange(count) % holdout_every == 0
+
+
+def base_forest(model):
+    # Floresta única do modelo salvo e o método de calibração a reajustar.
+    # Modifica o modelo recebido.
+    if isinstance(model, CalibratedForest):
+        return model.forest, model.method
+    if isinstance(model, RandomForestClassifier):
+        return model, 'isotonic'
+    if isinstance(model, CalibratedClassifierCV):
+        # As florestas das dobras do CV viram uma só, todas da geração 0.
+        forests = [calibrated.estimator for calibrated in model.calibrated_classifiers_]
+        if not all(isinstance(forest, RandomForestClassifier) for forest in forests):
+            raise ValueError("Apenas florestas aleatórias podem ser atualizadas")
+        merged = forests[0]
+        merged.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+        merged.n_estimators = len(merged.estimators_)
+        return merged, model.calibrated_classifiers_[0].method
+    raise ValueError(f"Modelo não suportado: {type(model).__name__}")
+
+
+def tree_generations(forest):
+    generations = getattr(forest, 'tree_generations_', None)
+    if generations is None or len(generations) != len(forest.estimators_):
+        return np.zeros(len(forest.estimators_), dtype=np.int64)
+    return np.asarray(generations, dtype=np.int64)
+
+
+def grow_forest(forest, X, y, n_trees=50, max_trees=600):
+    # Acrescenta n_trees árvores treinadas em (X, y) e descarta as mais
+    # antigas acima de max_trees.
+    if not np.array_equal(np.unique(y), forest.classes_):
+        raise ValueError("A janela de re-treino precisa ter amostras de todas as classes do modelo")
+    generations = tree_generations(forest)
+    generation = int(generations.max()) + 1 if len(generations) else 0
+
+    forest.set_params(warm_start=True, oob_score=False, n_estimators=len(forest.estimators_) + n_trees)
+    with warnings.catch_warnings():
+        # class_weight='balanced' passa a valer só para a janela, que é o desejado.
+        warnings.filterwarnings('ignore', message='class_weight presets', category=UserWarning)
+        forest.fit(X, y)
+    forest.set_params(warm_start=False)
+    generations = np.concatenate([generations, np.full(n_trees, generation, dtype=np.int64)])
+
+    excess = len(forest.estimators_) - max_trees
+    if excess > 0:
+        keep = np.sort(np.argsort(generations, kind='stable')[excess:])
+        forest.estimators_ = [forest.estimators_[i] for i in keep]
+        forest.n_estimators = len(forest.estimators_)
+        generations = generations[keep]
+    forest.tree_generations_ = generations
+    return forest
+
+
+def replay_indices(labels, per_class, rng):
+    # Até per_class índices de cada classe, sorteados sem reposição.
+    labels = np.asarray(labels)
+    chosen = []
+    for class_name in np.unique(labels):
+        candidates = np.flatnonzero(labels == class_name)
+        chosen.append(rng.choice(candidates, size=min(per_class, len(candidates)), replace=False))
+    return np.sort(np.concatenate(chosen)) if chosen else np.zeros(0, dtype=np.intp)
+
+
+def incremental_update(model, X, y, n_trees=50, max_trees=600, calibration_size=0.3, random_state=None):
+    # Devolve um CalibratedForest com a floresta de `model` acrescida de
+    # árvores treinadas em (X, y) e calibradores novos.
+    forest, method = base_forest(model)
+    X_fit, X_calibration, y_fit, y_calibration = train_test_split(
+        X, y, test_size=calibration_size, random_state=random_state, stratify=y
+    )
+    grow_forest(forest, X_fit, y_fit, n_trees=n_trees, max_trees=max_trees)
+    params = fit_calibrators(forest.predict_proba(X_calibration), y_calibration, forest.classes_, method)
+    return CalibratedForest(forest, method, **params)
@@ -0,0 +1,81 @@
+from collections import deque
+import numpy as np
+
+
+class KeywordMatcher:
+    # Autômato Aho-Corasick: conta, em uma única passada pelo texto, quantas
+    # palavras-chave distintas de cada grupo aparecem como substring.
+    def __init__(self, keywords_by_group):
+        self.groups = list(keywords_by_group)
+        self.keywords = []
+        self.keyword_groups = []
+        index_by_keyword = {}
+        for group_index, group in enumerate(self.groups):
+            for keyword in keywords_by_group[group]:
+                keyword = keyword.lower()
+                if keyword not in index_by_keyword:
+                    index_by_keyword[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self.keyword_groups.append(set())
+                self.keyword_groups[index_by_keyword[keyword]].add(group_index)
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [()]
+        for keyword_index, keyword in enumerate(self.keywords):
+            self._insert(keyword, keyword_index)
+        self._build_failure_links()
+
+    def _insert(self, keyword, keyword_index):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+            state = next_state
+        self._outputs[state] += (keyword_index,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] += self._outputs[self._fail[next_state]]
+
+    def find(self, text):
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+    def count(self, text):
+        counts = np.zeros(len(self.groups), dtype=np.intp)
+        for keyword_index in self.find(text):
+            for group_index in self.keyword_groups[keyword_index]:
+                counts[group_index] += 1
+        return counts
+
+    def count_batch(self, texts):
+        texts = list(texts)
+        counts = np.zeros((len(texts), len(self.groups)), dtype=np.intp)
+        seen = {}
+        for i, text in enumerate(texts):
+            if text not in seen:
+                seen[text] = self.count(text)
+            counts[i] = seen[text]
+        return counts
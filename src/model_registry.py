@@ -0,0 +1,128 @@
+import threading
+import numpy as np
+from contextlib import contextmanager
+from src.classifier import WasteClassifier
+from src.feature_extraction import FeatureExtractor
+from src.model_store import ModelStore
+
+
+# Registro de instâncias compartilhadas por todas as sessões de um processo.
+# O extrator e o classificador carregado são somente leitura depois de
+# publicados, então várias threads podem usá-los ao mesmo tempo. Uma thread
+# de fundo observa o ponteiro models/current; quando ele muda, a nova versão
+# é carregada, validada e aquecida fora do caminho das requisições e só então
+# publicada. Predições em andamento terminam no modelo anterior, que é
+# liberado quando a última delas devolve a referência.
+
+
+class ModelHandle:
+    def __init__(self, classifier, version):
+        self.classifier = classifier
+        self.version = version
+        self.refs = 0
+        self.retired = False
+
+
+class ModelRegistry:
+    def __init__(self, model_root='models', check_interval=2.0):
+        self.model_root = model_root
+        self.store = ModelStore(model_root)
+        self.check_interval = check_interval
+        self.extractor = FeatureExtractor()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._handle = None
+        self._stop = threading.Event()
+        self._watcher = None
+        self.swaps = 0
+        self.rejected = []
+
+    def start(self):
+        # Inicia o observador em segundo plano (idempotente).
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Erro ao verificar nova versão do modelo: {e}")
+
+    @property
+    def version(self):
+        return self._handle.version if self._handle is not None else None
+
+    def _validate(self, classifier):
+        # Falha aqui mantém a versão atual em uso. A predição de teste também
+        # toca as páginas mapeadas, para a primeira requisição não pagar por isso.
+        if not classifier.has_model:
+            raise ValueError("modelo ausente ou ilegível")
+        probe = np.zeros((1, self.extractor.feature_size))
+        probabilities = classifier.predict_batch(probe).probabilities
+        if probabilities.shape != (1, len(classifier.CLASSES)) or not np.isfinite(probabilities).all():
+            raise ValueError("predição de teste inválida")
+
+    def refresh(self):
+        # Carrega e publica a versão apontada por models/current, se mudou.
+        # Devolve True quando houve troca.
+        with self._load_lock:
+            version = self.store.current_version()
+            if self._handle is not None and (version == self._handle.version or version in self.rejected):
+                return False
+
+            classifier = WasteClassifier(self.model_root, version)
+            if self._handle is not None:
+                try:
+                    self._validate(classifier)
+                except Exception as e:
+                    print(f"Versão {version} rejeitada, mantendo {self._handle.version}: {e}")
+                    self.rejected.append(version)
+                    return False
+            else:
+                # Primeira carga: sem versão anterior, o classificador é usado
+                # mesmo sem modelo (cai no modo texto).
+                classifier.has_model
+
+            handle = ModelHandle(classifier, version)
+            with self._lock:
+                previous, self._handle = self._handle, handle
+                if previous is not None:
+                    self.swaps += 1
+                    previous.retired = True
+                    self._release_if_unused(previous)
+            if previous is not None:
+                print(f"Modelo trocado: {previous.version} → {version}")
+            return True
+
+    def _release_if_unused(self, handle):
+        if handle.retired and handle.refs == 0:
+            handle.classifier = None
+
+    @contextmanager
+    def classifier(self):
+        # with registry.classifier() as classifier: ...
+        if self._handle is None:
+            self.refresh()
+        with self._lock:
+            handle = self._handle
+            handle.refs += 1
+        try:
+            yield handle.classifier
+        finally:
+            with self._lock:
+                handle.refs -= 1
+                self._release_if_unused(handle)
+
+    @property
+    def has_model(self):
+        with self.classifier() as classifier:
+            return classifier.has_model
@@ -0,0 +1,97 @@
+import json
+import os
+import secrets
+import shutil
+from datetime import datetime
+
+
+# Modelos versionados: cada treino publica um diretório imutável em
+# models/versions/<versão>/ (model.pkl, compiled/ e info.json) e só então
+# troca o ponteiro models/current. O diretório é montado com outro nome e
+# renomeado de uma vez, e o ponteiro é trocado com os.replace, então um
+# leitor vê a versão anterior inteira ou a nova inteira, nunca um meio-termo.
+
+
+class ModelStore:
+    MODEL_FILE = 'model.pkl'
+    COMPILED_DIR = 'compiled'
+    INFO_FILE = 'info.json'
+    POINTER_FILE = 'current'
+
+    def __init__(self, root='models'):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+        self.pointer_path = os.path.join(root, self.POINTER_FILE)
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def model_path(self, version):
+        return os.path.join(self.version_dir(version), self.MODEL_FILE)
+
+    def artifact_path(self, version):
+        return os.path.join(self.version_dir(version), self.COMPILED_DIR)
+
+    def current_version(self):
+        try:
+            with open(self.pointer_path, encoding='utf-8') as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        return version if version and os.path.isdir(self.version_dir(version)) else None
+
+    def list_versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        # Diretórios de montagem (.<versão>.tmp) já têm info.json durante publish().
+        return sorted(name for name in os.listdir(self.versions_dir)
+                      if not name.startswith('.') and not name.endswith('.tmp')
+                      and os.path.exists(os.path.join(self.versions_dir, name, self.INFO_FILE)))
+
+    def read_info(self, version):
+        try:
+            with open(os.path.join(self.version_dir(version), self.INFO_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def new_version(self):
+        # Ordenável por data; o sufixo evita colisão entre treinos simultâneos.
+        return datetime.now().strftime('%Y%m%d-%H%M%S-') + secrets.token_hex(3)
+
+    def stage(self, version):
+        # Diretório temporário onde a versão é escrita antes de publish().
+        staging = os.path.join(self.versions_dir, f'.{version}.tmp')
+        os.makedirs(staging, exist_ok=True)
+        return staging
+
+    def publish(self, version, staging, info=None, activate=True):
+        info = dict(info or {}, version=version, created_at=datetime.now().isoformat())
+        with open(os.path.join(staging, self.INFO_FILE), 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+        os.replace(staging, self.version_dir(version))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        if not os.path.exists(os.path.join(self.version_dir(version), self.INFO_FILE)):
+            raise ValueError(f"Versão de modelo inexistente: {version}")
+        temp_path = self.pointer_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(temp_path, self.pointer_path)
+
+    def prune(self, keep=5):
+        # Remove versões antigas, preservando as `keep` mais recentes e a atual.
+        # No Windows, arquivos ainda mapeados por outro processo não podem ser
+        # apagados; a versão fica para a próxima limpeza.
+        current = self.current_version()
+        removed = []
+        for version in self.list_versions()[:-keep] if keep else self.list_versions():
+            if version == current:
+                continue
+            shutil.rmtree(self.version_dir(version), ignore_errors=True)
+            if not os.path.exists(self.version_dir(version)):
+                removed.append(version)
+        return removed
@@ -0,0 +1,64 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def default_workers():
+    workers = os.environ.get('GREENTRASH_WORKERS')
+    if workers:
+        return max(1, int(workers))
+    return os.cpu_count() or 1
+
+
+def use_processes():
+    # Threads bastam para OpenCV/NumPy, que liberam o GIL nas rotinas pesadas.
+    return os.environ.get('GREENTRASH_POOL', 'thread') == 'process'
+
+
+def chunked(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def iter_chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def imap_chunks(func, chunks, workers=None, processes=None, max_pending=None):
+    # Consome `chunks` sob demanda e devolve func(chunk) na ordem de entrada,
+    # com no máximo max_pending blocos em andamento para limitar a memória.
+    if workers is None:
+        workers = default_workers()
+    if processes is None:
+        processes = use_processes()
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    max_pending = max_pending or 2 * workers
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def map_chunks(func, items, workers=None, chunk_size=16, processes=None):
+    # Aplica func a blocos de items e devolve os resultados na ordem dos
+    # blocos. Com processos, func e os items precisam ser serializáveis.
+    chunks = chunked(list(items), chunk_size)
+    if workers is None:
+        workers = default_workers()
+    return list(imap_chunks(func, chunks, workers=min(workers, len(chunks)), processes=processes))
@@ -0,0 +1,109 @@
+from collections import Counter
+from functools import partial
+import cv2
+import numpy as np
+from src.data_utils import augmentations_per_class, augmentation_rng, random_augmentation
+from src.dataset_manifest import read_image
+from src.parallel import iter_chunks, imap_chunks
+
+
+# Pipeline de treino em estágios geradores: cada entrada do manifesto é
+# decodificada, reduzida ao tamanho de trabalho do extrator, aumentada e
+# extraída dentro de um bloco pequeno, de modo que a memória de pico depende
+# do tamanho do bloco e do número de workers, não do tamanho do corpus.
+
+
+def decode_stage(items, image_size):
+    for item in items:
+        image = read_image(item['path'], image_size)
+        if image is None:
+            continue
+        yield item, cv2.resize(image, image_size)
+
+
+def augment_stage(decoded, seed):
+    # Aumenta já na resolução de trabalho; a original vem sempre primeiro.
+    for item, image in decoded:
+        if item['cached'] is None:
+            yield item, image
+        for copy in range(item['copies']):
+            rng = augmentation_rng(seed, item['seed_index'], copy)
+            yield dict(item, key=None), random_augmentation(image, rng)
+
+
+def _process_chunk(extractor, seed, items):
+    rows = {}
+    to_decode = []
+    for position, item in enumerate(items):
+        item = dict(item, position=position)
+        if item['cached'] is not None:
+            rows[(position, -1)] = item['cached']
+        if item['cached'] is None or item['copies'] > 0:
+            to_decode.append(item)
+
+    images = []
+    slots = []
+    copies_seen = Counter()
+    for item, image in augment_stage(decode_stage(to_decode, extractor.plan.image_size), seed):
+        position = item['position']
+        if item['key'] is None:
+            slot = (position, copies_seen[position])
+            copies_seen[position] += 1
+        else:
+            slot = (position, -1)
+        images.append(image)
+        slots.append(slot)
+
+    new_keys = []
+    new_rows = []
+    if images:
+        extracted = extractor.extract_visual_features_batch(images).astype(np.float32)
+        for slot, row in zip(slots, extracted):
+            rows[slot] = row
+            if slot[1] == -1:
+                new_keys.append(items[slot[0]]['key'])
+                new_rows.append(row)
+
+    order = sorted(rows)
+    features = np.array([rows[slot] for slot in order], dtype=np.float32).reshape(-1, extractor.visual_size)
+    labels = [items[position]['class'] for position, _ in order]
+    return features, labels, new_keys, new_rows
+
+
+def stream_training_features(entries, extractor, cache, seed=None, workers=None, chunk_size=16, augment=True):
+    # Gera (features float32, rótulos) bloco a bloco: original seguida das
+    # cópias aumentadas de cada imagem. Originais vêm do cache quando possível
+    # e só são decodificadas se faltarem no cache ou precisarem de aumento.
+    # Com augment=False só as originais são geradas.
+    augment_per_image = augmentations_per_class(Counter(entry['class'] for entry in entries))
+
+    def jobs():
+        for chunk in iter_chunks(entries, chunk_size):
+            cached, found = cache.lookup(entry['sha256'] for entry in chunk)
+            cache.hits += int(found.sum())
+            cache.misses += int(len(chunk) - found.sum())
+            yield [{
+                'path': entry['path'],
+                'class': entry['class'],
+                'key': entry['sha256'],
+                'seed_index': int(entry['sha256'][:15], 16),
+                'cached': cached[i] if found[i] else None,
+                'copies': augment_per_image[entry['class']] if augment else 0
+            } for i, entry in enumerate(chunk)]
+
+    for features, labels, new_keys, new_rows in imap_chunks(partial(_process_chunk, extractor, seed),
+                                                            jobs(), workers=workers):
+        if new_keys:
+            cache.add(new_keys, new_rows)
+        yield features, labels
+
+
+def collect_features(stream):
+    blocks = []
+    labels = []
+    for features, block_labels in stream:
+        blocks.append(features)
+        labels.extend(block_labels)
+    if not blocks:
+        return np.zeros((0, 0), dtype=np.float32), np.array(labels)
+    return np.vstack(blocks), np.array(labels)
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+# Cache de resultados compartilhado por todas as sessões do processo: LRU
+# limitado a max_entries e com validade de ttl segundos. Cada entrada guarda
+# a versão do modelo que a produziu; uma consulta feita com outra versão
+# conta como falta e descarta a entrada, então uma troca de modelo invalida
+# o cache sem precisar avisá-lo.
+
+
+def text_key(text_features, tie_hint):
+    # Só texto: as features de texto (proporções por classe) e se o texto
+    # ativa o desempate por palavra-chave determinam o resultado inteiro.
+    return ('texto', np.asarray(text_features, dtype=np.float64).tobytes(), bool(tie_hint))
+
+
+def image_key(data, text_features, tie_hint):
+    # Imagem: resumo dos bytes enviados mais a parte de texto.
+    return ('imagem', hashlib.sha256(data).hexdigest()) + text_key(text_features, tie_hint)[1:]
+
+
+class ResultCache:
+    def __init__(self, max_entries=2048, ttl=3600.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        # Valor guardado para `key` pela mesma versão do modelo, ou None.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, expires, value = entry
+                if entry_version != version:
+                    self.invalidated += 1
+                elif expires < self.clock():
+                    self.expired += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0, 'evictions': self.evictions,
+                    'expired': self.expired, 'invalidated': self.invalidated}
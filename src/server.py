@@ -0,0 +1,322 @@
+import argparse
+import base64
+import binascii
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from src.batch_classify import decode_and_extract
+from src.image_upload import upload_limits
+from src.model_registry import ModelRegistry
+from src.parallel import chunked, default_workers
+from src.result_cache import ResultCache, image_key, text_key
+
+
+# Serviço de inferência HTTP só com a biblioteca padrão:
+#
+#   POST /classify   corpo = bytes da imagem (texto opcional em ?text=), ou
+#                    JSON {"text": "...", "image": "<base64>"}
+#   GET  /healthz    processo e agendador de lotes vivos
+#   GET  /readyz     modelo carregado e fila com folga (503 caso contrário)
+#   GET  /metrics    contadores do agendador e do cache
+#
+# Cada conexão é atendida por uma thread que só enfileira o pedido e espera
+# o resultado. Uma thread agrupa os pedidos que chegarem em até max_wait
+# segundos (ou max_batch pedidos): a decodificação e a extração rodam em
+# blocos num pool de workers e o modelo é chamado uma vez por lote.
+
+_STOP = object()
+
+
+class InvalidUpload(Exception):
+    # Imagem recusada ou ilegível (resposta 400); qualquer outra exceção do
+    # lote é falha do servidor (500).
+    pass
+
+
+class InferenceRequest:
+    def __init__(self, data, text):
+        self.data = data
+        self.text = text
+        self.future = Future()
+
+
+class MicroBatcher:
+    def __init__(self, registry, max_batch=32, max_wait=0.005, workers=None, max_pending=1024, cache=None,
+                 chunk_size=4):
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.workers = workers or default_workers()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='extractor')
+        self._thread = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        self._pool.shutdown(wait=False)
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    @property
+    def saturated(self):
+        return self._queue.qsize() >= self._queue.maxsize * 0.9
+
+    def submit(self, data, text=""):
+        # Future com o resultado (dict); levanta queue.Full com a fila cheia.
+        request = InferenceRequest(data, text)
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise
+        return request.future
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(request)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stopping = self._next_batch()
+            if batch:
+                try:
+                    self._process(batch)
+                except Exception as e:
+                    for request in batch:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+            if stopping:
+                break
+
+    def _process(self, batch):
+        extractor = self.registry.extractor
+        texts = [request.text for request in batch]
+        text_features = extractor.extract_text_features_batch(texts)
+        features = np.zeros((len(batch), extractor.feature_size))
+        features[:, extractor.visual_size:] = text_features
+        errors = [None] * len(batch)
+
+        with self.registry.classifier() as classifier:
+            version = classifier.version
+            keys = []
+            pending = []
+            for i, request in enumerate(batch):
+                tie_hint = classifier.tie_hint(request.text)
+                if request.data:
+                    key = image_key(request.data, text_features[i], tie_hint)
+                else:
+                    key = text_key(text_features[i], tie_hint)
+                keys.append(key)
+                cached = self.cache.get(key, version) if self.cache is not None else None
+                if cached is not None:
+                    request.future.set_result(dict(cached[1], versao=version))
+                else:
+                    pending.append(i)
+
+            with_image = [i for i in pending if batch[i].data]
+            chunks = chunked(with_image, self.chunk_size)
+            extracted = self._pool.map(lambda indices: decode_and_extract(
+                extractor, [batch[i].data for i in indices]), chunks)
+            for indices, (visual, chunk_errors) in zip(chunks, extracted):
+                features[indices, :extractor.visual_size] = visual
+                for i, error in zip(indices, chunk_errors):
+                    errors[i] = error
+
+            to_predict = [i for i in pending if errors[i] is None]
+            if to_predict:
+                prediction = classifier.predict_batch(features[to_predict], [texts[i] for i in to_predict])
+                for position, i in enumerate(to_predict):
+                    result = prediction[position]
+                    if self.cache is not None:
+                        self.cache.put(keys[i], version, (features[i].copy(), result))
+                    batch[i].future.set_result(dict(result, versao=version))
+
+        for i in pending:
+            if errors[i] is not None:
+                batch[i].future.set_exception(InvalidUpload(errors[i]))
+        with self._lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.errors += sum(error is not None for error in errors)
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'batches': self.batches,
+                    'mean_batch': self.requests / self.batches if self.batches else 0.0,
+                    'rejected': self.rejected, 'errors': self.errors, 'pending': self.pending,
+                    'workers': self.workers, 'max_batch': self.max_batch, 'max_wait': self.max_wait}
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'GreenTrash'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        batcher = self.server.batcher
+        if path == '/healthz':
+            status = 200 if batcher.alive else 503
+            self._send_json(status, {'status': 'ok' if status == 200 else 'parado'})
+        elif path == '/readyz':
+            registry = self.server.registry
+            ready = batcher.alive and registry.has_model and not batcher.saturated
+            self._send_json(200 if ready else 503, {'ready': ready, 'version': registry.version,
+                                                    'pending': batcher.pending})
+        elif path == '/metrics':
+            payload = {'batcher': batcher.stats(), 'version': self.server.registry.version}
+            if batcher.cache is not None:
+                payload['cache'] = batcher.cache.stats()
+            self._send_json(200, payload)
+        else:
+            self._send_json(404, {'erro': 'rota inexistente'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/classify':
+            self._send_json(404, {'erro': 'rota inexistente'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send_json(400, {'erro': 'Content-Length inválido'})
+            return
+        if length > self.server.max_body:
+            # O corpo não é lido; a conexão é encerrada.
+            self.close_connection = True
+            self._send_json(413, {'erro': f"corpo maior que {self.server.max_body} bytes"})
+            return
+        body = self.rfile.read(length) if length else b''
+
+        text = parse_qs(url.query).get('text', [""])[0]
+        data = body
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            try:
+                payload = json.loads(body or b'{}')
+                text = payload.get('text') or ""
+                if not isinstance(text, str):
+                    raise TypeError("text deve ser uma string")
+                data = base64.b64decode(payload['image'], validate=True) if payload.get('image') else b''
+            except (ValueError, TypeError, AttributeError, binascii.Error):
+                self._send_json(400, {'erro': 'JSON inválido'})
+                return
+        if not data and not text.strip():
+            self._send_json(400, {'erro': 'envie uma imagem ou um texto'})
+            return
+
+        try:
+            future = self.server.batcher.submit(data, text)
+        except queue.Full:
+            self._send_json(503, {'erro': 'servidor sobrecarregado, tente novamente'})
+            return
+        try:
+            result = future.result(timeout=self.server.request_timeout)
+        except InvalidUpload as e:
+            self._send_json(400, {'erro': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'erro': str(e)})
+            return
+        self._send_json(200, result)
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, registry, batcher, max_body=None, request_timeout=30.0, verbose=False):
+        super().__init__(address, InferenceHandler)
+        self.registry = registry
+        self.batcher = batcher
+        self.max_body = max_body or upload_limits()[0]
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP de classificação de resíduos.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--model-root', default='models')
+    parser.add_argument('--max-batch', type=int, default=32, help="pedidos por lote")
+    parser.add_argument('--max-wait-ms', type=float, default=5.0, help="espera máxima para completar um lote")
+    parser.add_argument('--workers', type=int, default=None, help="threads de decodificação/extração")
+    parser.add_argument('--max-pending', type=int, default=1024, help="pedidos na fila antes de recusar (503)")
+    parser.add_argument('--cache-size', type=int, default=4096, help="entradas do cache de resultados (0 desliga)")
+    parser.add_argument('--verbose', action='store_true', help="registra cada requisição")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.model_root).start()
+    registry.refresh()
+    cache = ResultCache(max_entries=args.cache_size) if args.cache_size else None
+    batcher = MicroBatcher(registry, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+                           workers=args.workers, max_pending=args.max_pending, cache=cache).start()
+    server = InferenceServer((args.host, args.port), registry, batcher, verbose=args.verbose)
+    print(f"Servidor de inferência em http://{args.host}:{args.port} (modelo {registry.version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.stop()
+        registry.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import numpy as np
+
+
+def uniform_lbp(gray, n_points, radius, chunk_size=1):
+    # Reproduz skimage.feature.local_binary_pattern(method='uniform') para um
+    # lote (N, H, W): vizinhos por interpolação bilinear com borda constante 0
+    # e transições contadas sem fechar o círculo, como na implementação Cython.
+    gray = np.asarray(gray)
+    codes = np.empty(gray.shape, dtype=np.uint8)
+    # blocos pequenos mantêm os temporários float64 no cache
+    for start in range(0, len(gray), chunk_size):
+        codes[start:start + chunk_size] = _uniform_lbp_chunk(
+            gray[start:start + chunk_size], n_points, radius)
+    return codes
+
+
+def _uniform_lbp_chunk(gray, n_points, radius):
+    image = gray.astype(np.float64)
+    n, rows, cols = image.shape
+
+    angles = 2 * np.pi * np.arange(n_points, dtype=np.float64) / n_points
+    rp = np.round(-radius * np.sin(angles), 5)
+    cp = np.round(radius * np.cos(angles), 5)
+
+    margin = int(np.ceil(radius)) + 1
+    padded = np.pad(image, ((0, 0), (margin, margin), (margin, margin)))
+    row_positions = np.arange(rows)
+    col_positions = np.arange(cols)
+
+    def window(row_offset, col_offset):
+        top, left = margin + row_offset, margin + col_offset
+        return padded[:, top:top + rows, left:left + cols]
+
+    def lerp(first, second, weight, out, scratch):
+        # (1 - w) * a + w * b, na mesma ordem de operações do Cython
+        np.multiply(first, 1 - weight, out=out)
+        np.multiply(second, weight, out=scratch)
+        return np.add(out, scratch, out=out)
+
+    top = np.empty(image.shape)
+    bottom = np.empty(image.shape)
+    scratch = np.empty(image.shape)
+    bit = np.empty(image.shape, dtype=bool)
+    previous = np.empty(image.shape, dtype=bool)
+    ones = np.zeros(image.shape, dtype=np.uint8)
+    changes = np.zeros(image.shape, dtype=np.uint8)
+
+    for i in range(n_points):
+        # rp/cp têm 5 casas decimais, então floor(r + rp) == r + floor(rp) e
+        # cada vizinho é uma janela deslocada; só dr/dc variam por linha/coluna.
+        r = row_positions + rp[i]
+        c = col_positions + cp[i]
+        dr = (r - np.floor(r))[:, None]
+        dc = (c - np.floor(c))[None, :]
+        min_r, max_r = int(np.floor(rp[i])), int(np.ceil(rp[i]))
+        min_c, max_c = int(np.floor(cp[i])), int(np.ceil(cp[i]))
+
+        if min_c == max_c:
+            texture_top = window(min_r, min_c)
+            texture_bottom = window(max_r, min_c)
+        else:
+            texture_top = lerp(window(min_r, min_c), window(min_r, max_c), dc, top, scratch)
+            texture_bottom = lerp(window(max_r, min_c), window(max_r, max_c), dc, bottom, scratch)
+        if min_r == max_r:
+            texture = texture_top
+        else:
+            texture = lerp(texture_top, texture_bottom, dr, top, scratch)
+
+        # texture - centro >= 0 equivale a texture >= centro em float64
+        np.greater_equal(texture, image, out=bit)
+        ones += bit
+        if i > 0:
+            np.not_equal(bit, previous, out=previous)
+            changes += previous
+        previous, bit = bit, previous
+
+    return np.where(changes <= 2, ones, n_points + 1)
+
+
+def _normalize_glcm(glcm):
+    glcm = glcm.astype(np.float64)
+    sums = np.sum(glcm, axis=(1, 2), keepdims=True)
+    sums[sums == 0] = 1
+    glcm /= sums
+    return glcm
+
+
+def glcm_properties(gray, levels=8):
+    # Equivale a graycomatrix(distances=[1], angles=[0], symmetric=True,
+    # normed=True) seguido de graycoprops para contraste, dissimilaridade,
+    # homogeneidade e energia, calculado para o lote inteiro.
+    # pares (i, j) codificados em uint8; vale para levels <= 16
+    quantized = np.asarray(gray, dtype=np.uint8) // (256 // levels)
+    pairs = quantized[:, :, :-1] * levels + quantized[:, :, 1:]
+    counts = np.stack([
+        np.bincount(image_pairs.ravel(), minlength=levels * levels)
+        for image_pairs in pairs
+    ]).reshape(len(pairs), levels, levels).astype(np.uint32)
+
+    # graycomatrix(normed=True) normaliza e graycoprops normaliza de novo
+    glcm = _normalize_glcm(_normalize_glcm(counts + counts.transpose(0, 2, 1)))
+
+    i, j = np.ogrid[0:levels, 0:levels]
+    contrast = np.sum(glcm * (i - j) ** 2, axis=(1, 2))
+    dissimilarity = np.sum(glcm * np.abs(i - j), axis=(1, 2))
+    homogeneity = np.sum(glcm * (1.0 / (1.0 + (i - j) ** 2)), axis=(1, 2))
+    energy = np.sqrt(np.sum(glcm ** 2, axis=(1, 2)))
+
+    return np.stack([contrast, dissimilarity, homogeneity, energy], axis=1)
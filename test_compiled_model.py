@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.calibration import CalibratedClassifierCV
+from src.classifier import WasteClassifier
+from src.calibration import CALIBRATION_METHODS, fit_calibrated_forest
+from src.compiled_model import compile_model, save_compiled, load_compiled
+
+
+def test_compiled_model():
+    print("="*60)
+    print("TESTE: MODELO COMPILADO x SKLEARN")
+    print("="*60)
+
+    rng = np.random.default_rng(42)
+    X = rng.random((600, 122)) * rng.choice([1, 10, 100], 122)
+    y = rng.choice(WasteClassifier.CLASSES, len(X))
+    X_test = rng.random((300, 122)) * rng.choice([1, 10, 100], 122)
+
+    models = {
+        'floresta': RandomForestClassifier(n_estimators=50, random_state=42),
+        'isotonic': CalibratedClassifierCV(RandomForestClassifier(n_estimators=50, random_state=42),
+                                           method='isotonic', cv=3),
+        'sigmoid': CalibratedClassifierCV(RandomForestClassifier(n_estimators=50, random_state=42),
+                                          method='sigmoid', cv=3),
+    }
+    for mode in ('oob', 'holdout'):
+        for method in CALIBRATION_METHODS:
+            models[f'{mode}/{method}'] = fit_calibrated_forest(
+                RandomForestClassifier(n_estimators=50, random_state=42), X, y, mode=mode, method=method)
+
+    all_close = True
+    artifact_dir = tempfile.mkdtemp()
+    for name, model in models.items():
+        if not hasattr(model, 'forest'):
+            model.fit(X, y)
+        compiled = compile_model(model)
+        expected = model.predict_proba(X_test)
+        actual = compiled.predict_proba(X_test)
+        # O artefato gravado (mapeado em memória) é o que a aplicação carrega.
+        path = os.path.join(artifact_dir, name.replace('/', '_'))
+        save_compiled(compiled, path)
+        loaded = load_compiled(path).predict_proba(X_test)
+        max_diff = max(np.abs(expected - actual).max(), np.abs(expected - loaded).max())
+        close = np.allclose(expected, actual, atol=1e-9) and np.allclose(expected, loaded, atol=1e-9)
+        all_close = all_close and close
+        status = "✓" if close else "✗"
+
+        start = time.perf_counter()
+        for row in X_test[:20]:
+            model.predict_proba(row.reshape(1, -1))
+        sklearn_time = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        for row in X_test[:20]:
+            compiled.predict_proba(row)
+        compiled_time = (time.perf_counter() - start) / 20
+
+        print(f"  {status} {name}: diferença máxima {max_diff:.1e} | "
+              f"por amostra: sklearn {sklearn_time*1000:.2f}ms, compilado {compiled_time*1000:.2f}ms")
+
+    shutil.rmtree(artifact_dir, ignore_errors=True)
+    assert all_close
+    print("\n✓ Probabilidades equivalentes")
+
+
+if __name__ == "__main__":
+    test_compiled_model()
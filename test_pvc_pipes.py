@@ -11,7 +11,7 @@ def test_pvc_pipes():
     extractor = FeatureExtractor()
     classifier = WasteClassifier()
     
-    if classifier.model is None:
+    if not classifier.has_model:
         print("❌ Modelo não encontrado. Execute train_model_real.py primeiro.")
         return
     
@@ -29,11 +29,10 @@ def test_pvc_pipes():
     print("\nCasos de teste:")
     predictions = []
     true_labels = []
+    confidences = []
     
     for text, expected in test_cases:
-        text_features = extractor.extract_text_features(text)
-        visual_features = np.zeros(118)
-        features = np.concatenate([visual_features, text_features])
+        features = extractor.extract_combined_features(text=text)
         
         result = classifier.predict(features, text=text)
         predicted = result['classe']
@@ -41,10 +40,18 @@ def test_pvc_pipes():
         
         predictions.append(predicted)
         true_labels.append(expected)
+        confidences.append(confidence)
         
         status = "✓" if predicted == expected else "✗"
         print(f"  {status} '{text}' → {predicted} (esperado: {expected}, confiança: {confidence:.1%})")
     
+    # predict_batch deve dar o mesmo resultado que predict() item a item.
+    texts = [text for text, _ in test_cases]
+    batch = classifier.predict_batch(np.array([extractor.extract_combined_features(text=text) for text in texts]), texts)
+    assert list(batch.labels) == predictions
+    assert np.allclose(batch.confidence, confidences)
+    print("\n✓ predict_batch igual a predict()")
+    
     print("\n" + "="*60)
     print("MÉTRICAS DO TESTE")
     print("="*60)
@@ -0,0 +1,55 @@
+import os
+import time
+import numpy as np
+import pytest
+from src.feature_extraction import FeatureExtractor
+from src.data_utils import load_images_from_folder
+
+
+def test_texture_backends():
+    print("="*60)
+    print("TESTE: LBP/GLCM NATIVO x SCIKIT-IMAGE")
+    print("="*60)
+
+    pytest.importorskip('skimage', reason="scikit-image não instalado; não há com o que comparar")
+    reference = FeatureExtractor(texture_backend='skimage')
+    native = FeatureExtractor(texture_backend='native')
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    base_path = os.path.join(script_dir, 'assets', 'images')
+    images = []
+    for folder_name in sorted(os.listdir(base_path)):
+        images.extend(img for img, _ in load_images_from_folder(os.path.join(base_path, folder_name), folder_name))
+
+    rng = np.random.default_rng(42)
+    images.append(rng.integers(0, 256, (300, 400, 3), dtype=np.uint8))
+    images.append(np.full((300, 400, 3), 128, dtype=np.uint8))
+
+    print(f"\nImagens comparadas: {len(images)}")
+
+    start = time.perf_counter()
+    X_reference = reference.extract_visual_features_batch(images)
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X_native = native.extract_visual_features_batch(images)
+    native_time = time.perf_counter() - start
+
+    layout = native.feature_layout()
+    all_equal = True
+    for group in ('lbp', 'glcm'):
+        begin, end = layout[group]
+        equal = np.array_equal(X_reference[:, begin:end], X_native[:, begin:end], equal_nan=True)
+        max_diff = np.nanmax(np.abs(X_reference[:, begin:end] - X_native[:, begin:end]))
+        all_equal = all_equal and equal
+        status = "✓" if equal else "✗"
+        print(f"  {status} {group}: idêntico={equal} (diferença máxima: {max_diff:.3e})")
+
+    print(f"\nTempo scikit-image: {reference_time:.2f}s")
+    print(f"Tempo nativo: {native_time:.2f}s")
+    assert all_equal, "Backends divergem"
+    print("\n✓ Backends equivalentes")
+
+
+if __name__ == "__main__":
+    test_texture_backends()
@@ -1,35 +1,15 @@
 import os
-import cv2
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, precision_score, recall_score, f1_score
 from src.feature_extraction import FeatureExtractor
 from src.classifier import WasteClassifier
-from src.data_utils import detect_duplicates, filter_low_quality, balance_classes_with_augmentation
-
-
-def load_images_from_folder(folder_path, class_name):
-    images = []
-    if not os.path.exists(folder_path):
-        print(f"⚠️ Pasta não encontrada: {folder_path}")
-        return images
-    
-    valid_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.avif')
-    
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(valid_extensions):
-            file_path = os.path.join(folder_path, filename)
-            try:
-                img = cv2.imread(file_path)
-                if img is not None:
-                    images.append((img, class_name))
-                    print(f"  ✓ {filename}")
-                else:
-                    print(f"  ✗ Erro ao ler: {filename}")
-            except Exception as e:
-                print(f"  ✗ Erro em {filename}: {e}")
-    
-    return images
+from src.feature_cache import FeatureCache
+from src.data_utils import augmentations_per_class
+from src.parallel import default_workers
+from src.dataset_manifest import DatasetManifest, deduplicate_entries, filter_entries_by_quality
+from src.pipeline import stream_training_features, collect_features
+from src.incremental import in_holdout
 
 
 def train_model_with_real_images():
@@ -48,67 +28,66 @@ def train_model_with_real_images():
     os.chdir(script_dir)
     base_path = 'assets/images'
     
-    print("\n1. Carregando imagens reais...")
-    all_images = []
+    print("\n1. Verificando imagens reais (manifesto incremental)...")
+    manifest = DatasetManifest()
+    all_entries = manifest.scan(base_path, class_mapping)
     
     for folder_name, class_name in class_mapping.items():
-        folder_path = os.path.join(base_path, folder_name)
-        print(f"\n📁 Carregando {class_name} de {folder_name}/...")
-        images = load_images_from_folder(folder_path, class_name)
-        all_images.extend(images)
-        print(f"  Total: {len(images)} imagens")
+        count = sum(1 for entry in all_entries if entry['class'] == class_name)
+        print(f"  📁 {class_name} ({folder_name}/): {count} imagens")
+    print(f"  - Novas: {manifest.stats['new']} | alteradas: {manifest.stats['changed']} | "
+          f"inalteradas: {manifest.stats['unchanged'] + manifest.stats['touched']} | "
+          f"removidas: {manifest.stats['removed']} | ilegíveis: {manifest.stats['unreadable']}")
     
-    if len(all_images) == 0:
+    if len(all_entries) == 0:
         print("\n❌ Nenhuma imagem encontrada! Verifique a pasta assets/images/")
         return
     
-    print(f"\n✅ Total de imagens carregadas: {len(all_images)}")
+    print(f"\n✅ Total de imagens: {len(all_entries)}")
     
     print("\n2. Limpando duplicatas e imagens de baixa qualidade...")
-    unique_images, duplicates = detect_duplicates(all_images)
+    unique_entries, duplicates = deduplicate_entries(all_entries)
     print(f"  - Duplicatas removidas: {len(duplicates)}")
     
-    filtered_images, removed = filter_low_quality(unique_images, min_quality=0.3)
+    filtered_entries, removed = filter_entries_by_quality(unique_entries, min_quality=0.3)
     print(f"  - Imagens de baixa qualidade removidas: {len(removed)}")
-    print(f"  - Imagens válidas: {len(filtered_images)}")
+    print(f"  - Imagens válidas: {len(filtered_entries)}")
+    
+    # Fora do treino: holdout do re-treino incremental (ver src/incremental.py).
+    held = sum(1 for entry in filtered_entries if in_holdout(entry['sha256']))
+    filtered_entries = [entry for entry in filtered_entries if not in_holdout(entry['sha256'])]
+    print(f"  - Reservadas para o holdout: {held}")
     
     print("\n3. Balanceando classes com data augmentation...")
     class_counts_before = {}
-    for _, label in filtered_images:
-        class_counts_before[label] = class_counts_before.get(label, 0) + 1
+    for entry in filtered_entries:
+        class_counts_before[entry['class']] = class_counts_before.get(entry['class'], 0) + 1
     
     print("  Distribuição antes do balanceamento:")
     for cls, count in class_counts_before.items():
         print(f"    • {cls}: {count} imagens")
     
-    balanced_images = balance_classes_with_augmentation(filtered_images)
-    class_counts_after = {}
-    for _, label in balanced_images:
-        class_counts_after[label] = class_counts_after.get(label, 0) + 1
+    augment_per_image = augmentations_per_class(class_counts_before)
+    class_counts_after = {cls: count * (1 + augment_per_image[cls])
+                          for cls, count in class_counts_before.items()}
     
     print("\n  Distribuição após balanceamento:")
     for cls, count in class_counts_after.items():
         print(f"    • {cls}: {count} imagens")
     
-    print("\n4. Extraindo features das imagens...")
+    workers = default_workers()
+    print(f"\n4. Extraindo features das imagens ({workers} workers)...")
     extractor = FeatureExtractor()
-    X = []
-    y = []
-    
-    for img, class_name in balanced_images:
-        visual_features = extractor.extract_visual_features(img)
-        text_features = extractor.extract_text_features("")
-        combined_features = np.concatenate([visual_features, text_features])
-        
-        X.append(combined_features)
-        y.append(class_name)
-    
-    X = np.array(X)
-    y = np.array(y)
+    cache = FeatureCache(extractor)
+    stream = stream_training_features(filtered_entries, extractor, cache, seed=42, workers=workers)
+    visual_features, y = collect_features(stream)
+    print(f"  - Features em cache: {cache.hits} | extraídas: {len(visual_features) - cache.hits}")
+    text_features = np.tile(extractor.extract_text_features(""), (len(visual_features), 1))
+    X = np.hstack([visual_features, text_features])
     
     print(f"\nDados processados:")
     print(f"  - Total de amostras: {len(X)}")
-    print(f"  - Features por amostra: {X.shape[1]} (118 visuais + 4 textuais)")
+    print(f"  - Features por amostra: {X.shape[1]} ({extractor.visual_size} visuais + {extractor.text_size} textuais)")
     
     print("\n5. Dividindo dados em treino e teste (80/20)...")
     if len(X) < 10:
@@ -129,10 +108,7 @@ def train_model_with_real_images():
     
     if len(X_test) > 0:
         print("\n7. Avaliando modelo no conjunto de teste...")
-        predictions = []
-        for features in X_test:
-            result = classifier.predict(features, text="")
-            predictions.append(result['classe'])
+        predictions = list(classifier.predict_batch(X_test, texts="").labels)
         
         print("\n" + "="*60)
         print("RELATÓRIO DE CLASSIFICAÇÃO")